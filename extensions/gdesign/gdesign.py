@@ -11,9 +11,18 @@ licence : GPL
 """
 
 import os
+import sys
 import re
 import math
 import random
+import heapq
+from array import array
+from collections import OrderedDict
+from io import BytesIO
+try:
+    from StringIO import StringIO ## python 2.x
+except ImportError:
+    from io import StringIO
 from lxml import etree
 
 _nss = {
@@ -53,6 +62,60 @@ def _str_num(x,digit = 5):
     else:
         return str(round(x,digit))
 
+def _str_nums(values,digit = 5):
+    """
+    return the list of the _str_num strings of the values
+    values is a list of integers or floats
+    digit is the maximum number of digits in the strings
+    the numbers are written with '%.*f' and their trailing zeros removed
+    the values whose repr may differ (tiny, huge, inf, nan) use _str_num
+
+    Examples
+
+    >>> print(_str_nums([2.123,3.0073,3.0013,-0.001,1e-05,12],2))
+    ['2.12', '3.01', '3', '0', '0', '12']
+    >>> print(_str_nums([1e-05,0.5],5))
+    ['1e-05', '0.5']
+    """
+    if digit < 0 or sys.version_info[0] < 3: ## python 2.x str and round differ from '%f'
+        return [_str_num(x,digit) for x in values]
+    form = '%.'+str(digit)+'f'
+    limit = 10.0**(15-digit) ## 15 significant digits are written back by repr
+    strings = []
+    for x in values:
+        s = form % x
+        if digit > 0:
+            s = s.rstrip('0').rstrip('.')
+        if s == '-0':
+            s = '0'
+        elif not abs(x) < limit or (abs(x) < 1e-3 and '.' in s):
+            s = _str_num(x,digit)
+        strings.append(s)
+    return strings
+
+def _str_points(points,digit = 5):
+    """
+    return the list of the 'x,y' strings of the points
+    points is a list of Point or of (x,y) tuples
+    digit is the maximum number of digits of the numbers
+
+    Examples
+
+    >>> print(_str_points([Point(2.123,1),Point(3.0013,-0.5)],2))
+    ['2.12,1', '3,-0.5']
+    >>> print(_str_points([(1.5,2)],2))
+    ['1.5,2']
+    """
+    coords = []
+    for p in points:
+        if type(p) == tuple:
+            coords.extend(p)
+        else:
+            coords.append(p.x)
+            coords.append(p.y)
+    strings = _str_nums(coords,digit)
+    return [strings[i]+','+strings[i+1] for i in range(0,len(strings),2)]
+
 def _is_num(x):
     """
     return True if x represents a number (float or integer) else False
@@ -74,6 +137,431 @@ def _is_num(x):
     except:
         return False
 
+_re_number = '[-+]?(?:[0-9]+[.]?[0-9]*|[.][0-9]+)(?:[eE][-+]?[0-9]+)?'
+_re_svg_number = re.compile(_re_number)
+_re_svg_command = re.compile('([A-DF-Za-df-z])')
+_re_svg_invalid = re.compile('[^-+.,0-9eE \t\r\n\fA-DF-Za-df-z]') ## neither a command nor in a number
+_svg_command_args = {'M':2,'L':2,'C':6,'Q':4,'A':7} ## numbers read by each curve of a command
+_svg_command_kinds = {'L':0,'C':3,'Q':2} ## PathStore kind of the curves of a command
+_re_svg_transform = re.compile('[\\s,]*(matrix|translate|scale|rotate|skewX|skewY)\\s*\\(([^()]*)\\)')
+_re_svg_separator = re.compile('^[\\s,]*$')
+_svg_transform_args = {'matrix':(6,),'translate':(1,2),'scale':(1,2),'rotate':(1,3),'skewX':(1,),'skewY':(1,)}
+
+def _svg_path_tokens(svgPath):
+    """
+    split a svg path string on its command letters
+    yield (command,numbers) couples where command is a letter
+    and numbers the list of floats following it
+    packed numbers such as '10-5', '.5.5' or '1e-3' are accepted
+    but not the python only syntax of float such as '1_0'
+
+    Examples
+
+    >>> print(list(_svg_path_tokens('M10-5L.5.5,1e-3 z')))
+    [('M', [10.0, -5.0]), ('L', [0.5, 0.5, 0.001]), ('z', [])]
+    >>> print(list(_svg_path_tokens('M 1_0 0')))
+    Traceback (most recent call last):
+    ...
+    ValueError: invalid character _ in M 1_0 0
+    """
+    invalid = _re_svg_invalid.search(svgPath)
+    if invalid:
+        raise ValueError('invalid character %s in %s' % (invalid.group(),svgPath))
+    s = _re_svg_command.split(svgPath)
+    if s[0].replace(',',' ').split():
+        raise ValueError('missing command in %s' % svgPath)
+    for i in range(2,len(s),2):
+        try:
+            numbers = [float(x) for x in s[i].replace(',',' ').split()]
+        except ValueError:
+            ## packed numbers such as '10-5' : use the number regex
+            unknown = _re_svg_number.sub(' ',s[i]).replace(',',' ').split()
+            if unknown:
+                raise ValueError('unknown command %s in %s' % (unknown[0][0],svgPath))
+            numbers = [float(x) for x in _re_svg_number.findall(s[i])]
+        yield (s[i-1],numbers)
+
+def _svg_arc(start,numbers,relative = False):
+    """
+    return the Arc of a svg arc command and its end Point
+    start is the Point where the arc begins
+    numbers the 7 svg arc numbers rx,ry,angle,large arc flag,sweep flag,x,y
+    relative True if x,y are relative to start
+    """
+    rx,ry = numbers[0],numbers[1]
+    phi = math.radians(numbers[2])
+    fa = int(numbers[3])
+    fs = int(numbers[4])
+    if relative:
+        end = Point(numbers[5]+start.x,numbers[6]+start.y)
+    else:
+        end = Point(numbers[5],numbers[6])
+    b = end.copy().rotate(Point(0,0),-phi)
+    a = start.copy().rotate(Point(0,0),-phi)
+
+    rad = min(math.sqrt(((b.x-a.x)/rx)**2+((b.y-a.y)/ry)**2)/2.0,1)
+    vx = (b.x-a.x)/rx/(2-4*fs)/rad
+    vy = (b.y-a.y)/ry/(4*fs-2)
+    if vy > 0:
+        v = math.asin(vx)
+    else:
+        v = math.pi - math.asin(vx)
+    if fa == 1:
+        u = math.pi - (2*fs-1)*math.asin(rad)
+    else:
+        u = (2*fs-1)*math.asin(rad)
+    center = Point(a.x-rx*math.cos(v-u),a.y-ry*math.sin(v-u)).rotate(Point(0,0),phi)
+    return Arc(center,rx,ry,phi,v-u,v+u),end
+
+def _svg_absolute(x,y,numbers,n):
+    """
+    return the flat list of absolute coordinates x,y,x0,y0,x1,y1...
+    from relative svg numbers
+    numbers are read by groups of n, each group is relative to the last point of the previous group
+
+    Examples
+
+    >>> print(_svg_absolute(1,1,[1,0,2,2,0,1,1,0],4))
+    [1, 1, 2, 1, 3, 3, 3, 4, 4, 3]
+    """
+    coords = [x,y]
+    for i in range(0,len(numbers)-n+1,n):
+        for j in range(i,i+n,2):
+            coords.append(x+numbers[j])
+            coords.append(y+numbers[j+1])
+        x = coords[-2]
+        y = coords[-1]
+    return coords
+
+def _bezier_flat(pts,approx):
+    """
+    return True if the bezier curve of control points pts is within approx of its chord
+    if all the control points project on the chord, the curve distance to the chord is
+    sum(B(i,n,t)*h(i)) <= (1-2**(1-n))*max(|h(i)|) where h(i) are the control points
+    distances to the chord line (the end points have none) else the curve lies
+    in the convex hull of its control points
+
+    Examples
+
+    >>> print(_bezier_flat([(0,0),(1,1),(2,1),(3,0)],0.8))
+    True
+    >>> print(_bezier_flat([(0,0),(1,1),(2,1),(3,0)],0.7))
+    False
+    >>> print(_bezier_flat([(0,0),(-1,0.1),(4,0.1),(3,0)],0.5))
+    False
+    """
+    ax,ay = pts[0]
+    bx,by = pts[-1]
+    dx = bx-ax
+    dy = by-ay
+    d = dx*dx+dy*dy
+    if d > 0:
+        h = 0
+        inside = True
+        for px,py in pts[1:-1]:
+            s = (px-ax)*dx+(py-ay)*dy
+            if s < 0 or s > d:
+                inside = False
+                break
+            h = max(h,abs((px-ax)*dy-(py-ay)*dx))
+        if inside:
+            return (1-2.0**(1-(len(pts)-1)))*h/math.sqrt(d) <= approx
+    for px,py in pts[1:-1]:
+        if _segment_distance(ax,ay,bx,by,px,py) > approx:
+            return False
+    return True
+
+def _segment_distance(ax,ay,bx,by,px,py):
+    """
+    return the distance from point (px,py) to the segment from (ax,ay) to (bx,by)
+
+    Examples
+
+    >>> print(_segment_distance(1,2,4,6,2,2))
+    0.8
+    >>> print(_segment_distance(1,2,1,2,4,6))
+    5.0
+    """
+    dx = bx-ax
+    dy = by-ay
+    d = dx*dx+dy*dy
+    s = (px-ax)*dx+(py-ay)*dy
+    if s <= 0 or d == 0:
+        return math.sqrt((px-ax)**2+(py-ay)**2)
+    elif s >= d:
+        return math.sqrt((px-bx)**2+(py-by)**2)
+    else:
+        return abs((px-ax)*dy-(py-ay)*dx)/math.sqrt(d)
+
+def _douglas_peucker(xs,ys,approx,a=0,b=None):
+    """
+    Douglas-Peucker simplification of the polyline of coordinates xs and ys
+    from index a to index b (default: last), the distances are measured to the chords
+    (same as Line.distance on segments)
+    return a bytearray with 1 for the kept nodes, 0 for the erased ones
+
+    Examples
+
+    >>> print(list(_douglas_peucker([4,4,3],[3,1,-2],0.5)))
+    [1, 0, 1]
+    >>> print(list(_douglas_peucker([4,4,3],[3,1,-2],0.2)))
+    [1, 1, 1]
+    """
+    if b is None:
+        b = len(xs)-1
+    keep = bytearray(len(xs))
+    keep[a] = keep[b] = 1
+    stack = [(a,b)]
+    while stack:
+        a,b = stack.pop()
+        ax,ay,bx,by = xs[a],ys[a],xs[b],ys[b]
+        d = math.sqrt((bx-ax)**2+(by-ay)**2)
+        d2 = d**2
+        dmax = 0
+        idmax = 0
+        for i in range(a+1,b):
+            px = xs[i]
+            py = ys[i]
+            if d < Coord.nullDistance:
+                dist = math.sqrt((ax-px)**2+(ay-py)**2)
+            else:
+                s = (px-ax)*(bx-ax)+(py-ay)*(by-ay)
+                if s <= 0:
+                    dist = math.sqrt((ax-px)**2+(ay-py)**2)
+                elif s >= d2:
+                    dist = math.sqrt((bx-px)**2+(by-py)**2)
+                else:
+                    dist = abs((px-ax)*(by-ay)-(py-ay)*(bx-ax))/d
+            if dist > dmax:
+                idmax = i
+                dmax = dist
+        if dmax > approx:
+            keep[idmax] = 1
+            stack.append((idmax,b))
+            stack.append((a,idmax))
+    return keep
+
+def _visvalingam(xs,ys,area = 0,count = None):
+    """
+    Visvalingam-Whyatt simplification of the polyline of coordinates xs and ys
+    the node with the smallest effective area (area of the triangle with its neighbours)
+    is erased while this area is less than area or while there are more than count nodes
+    first and last nodes are always kept
+    return a bytearray with 1 for the kept nodes, 0 for the erased ones
+
+    Examples
+
+    >>> print(list(_visvalingam([0,1,2,3,4],[0,0.1,0,2,0],0.5)))
+    [1, 0, 1, 1, 1]
+    >>> print(list(_visvalingam([0,1,2,3,4],[0,0.1,0,2,0],count=3)))
+    [1, 0, 0, 1, 1]
+    """
+    n = len(xs)
+    keep = bytearray([1])*n
+    if n < 3:
+        return keep
+    prev = list(range(-1,n-1))
+    succ = list(range(1,n+1))
+    def triangle(i):
+        a = prev[i]
+        b = succ[i]
+        return abs((xs[a]-xs[i])*(ys[b]-ys[i])-(xs[b]-xs[i])*(ys[a]-ys[i]))/2.0
+    areas = [0]+[triangle(i) for i in range(1,n-1)]+[0]
+    heap = [(areas[i],i) for i in range(1,n-1)]
+    heapq.heapify(heap)
+    remaining = n
+    while heap:
+        a,i = heap[0]
+        if not keep[i] or a != areas[i]: ## erased node or outdated area
+            heapq.heappop(heap)
+            continue
+        if a >= area and (count is None or remaining <= count):
+            break
+        heapq.heappop(heap)
+        keep[i] = 0
+        remaining -= 1
+        succ[prev[i]] = succ[i]
+        prev[succ[i]] = prev[i]
+        for j in (prev[i],succ[i]):
+            if 0 < j < n-1:
+                areas[j] = max(triangle(j),a) ## effective areas never decrease
+                heapq.heappush(heap,(areas[j],j))
+    return keep
+
+class _HullTree(object):
+    """
+    segment tree of the convex hulls of the nodes of a polyline
+    find the farthest node from a line in any index range
+    in O(log(n)**2) after a O(n log(n)) construction
+    """
+
+    leafSize = 16 ## ranges scanned without hull
+
+    def __init__(self,xs,ys):
+        """
+        build the tree on coordinates lists xs and ys
+        """
+        self.xs = xs
+        self.ys = ys
+        self.root = self._build(0,len(xs)-1)
+
+    def _chains(self,idx):
+        """
+        return the upper and lower hull chains of the indexes idx sorted by x
+        """
+        xs,ys = self.xs,self.ys
+        upper = []
+        lower = []
+        for i in idx:
+            while len(upper) >= 2 and (xs[upper[-1]]-xs[upper[-2]])*(ys[i]-ys[upper[-2]])-(ys[upper[-1]]-ys[upper[-2]])*(xs[i]-xs[upper[-2]]) >= 0:
+                upper.pop()
+            upper.append(i)
+            while len(lower) >= 2 and (xs[lower[-1]]-xs[lower[-2]])*(ys[i]-ys[lower[-2]])-(ys[lower[-1]]-ys[lower[-2]])*(xs[i]-xs[lower[-2]]) <= 0:
+                lower.pop()
+            lower.append(i)
+        return upper,lower
+
+    def _build(self,lo,hi):
+        """
+        return the node (lo,hi,upper,lower,left,right) for the index range lo..hi
+        """
+        xs,ys = self.xs,self.ys
+        if hi-lo < _HullTree.leafSize:
+            idx = sorted(range(lo,hi+1),key=lambda i:(xs[i],ys[i]))
+            return (lo,hi)+self._chains(idx)+(None,None)
+        mid = (lo+hi)//2
+        left = self._build(lo,mid)
+        right = self._build(mid+1,hi)
+        idx = set(left[2]+left[3]+right[2]+right[3])
+        idx = sorted(idx,key=lambda i:(xs[i],ys[i]))
+        return (lo,hi)+self._chains(idx)+(left,right)
+
+    def _extreme(self,chain,nx,ny):
+        """
+        return the index of chain maximizing nx*x+ny*y (the sequence is unimodal)
+        """
+        xs,ys = self.xs,self.ys
+        lo = 0
+        hi = len(chain)-1
+        while lo < hi:
+            m = (lo+hi)//2
+            if nx*(xs[chain[m+1]]-xs[chain[m]])+ny*(ys[chain[m+1]]-ys[chain[m]]) > 0:
+                lo = m+1
+            else:
+                hi = m
+        return chain[lo]
+
+    def farthest(self,a,b,ox,oy,nx,ny):
+        """
+        return (value,index) of the node of index range a..b
+        with the maximum of abs(nx*(x-ox)+ny*(y-oy))
+        """
+        xs,ys = self.xs,self.ys
+        best = (-1,a)
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            lo,hi,upper,lower,left,right = node
+            if hi < a or lo > b:
+                continue
+            if a <= lo and hi <= b:
+                if ny >= 0:
+                    i = self._extreme(upper,nx,ny)
+                    j = self._extreme(lower,-nx,-ny)
+                else:
+                    i = self._extreme(lower,nx,ny)
+                    j = self._extreme(upper,-nx,-ny)
+                candidates = (i,j)
+            elif left is None:
+                candidates = range(max(a,lo),min(b,hi)+1)
+            else:
+                stack.append(right)
+                stack.append(left)
+                continue
+            for i in candidates:
+                v = abs(nx*(xs[i]-ox)+ny*(ys[i]-oy))
+                if v > best[0]:
+                    best = (v,i)
+        return best
+
+def _douglas_peucker_hull(xs,ys,approx,a=0,b=None):
+    """
+    Douglas-Peucker simplification of the polyline of coordinates xs and ys
+    with a convex hulls tree to find the farthest nodes : O(n log(n)) for long polylines
+    the distances are measured to the chords lines (classic Douglas-Peucker),
+    except for closed chords (distances to the point)
+    return a bytearray with 1 for the kept nodes, 0 for the erased ones
+
+    Examples
+
+    >>> print(list(_douglas_peucker_hull([4,4,3],[3,1,-2],0.5)))
+    [1, 0, 1]
+    >>> print(list(_douglas_peucker_hull([4,4,3],[3,1,-2],0.2)))
+    [1, 1, 1]
+    """
+    if b is None:
+        b = len(xs)-1
+    keep = bytearray(len(xs))
+    keep[a] = keep[b] = 1
+    tree = _HullTree(xs,ys)
+    stack = [(a,b)]
+    while stack:
+        a,b = stack.pop()
+        if b-a < 2:
+            continue
+        ax,ay,bx,by = xs[a],ys[a],xs[b],ys[b]
+        d = math.sqrt((bx-ax)**2+(by-ay)**2)
+        if d < Coord.nullDistance:
+            dmax = 0
+            idmax = 0
+            for i in range(a+1,b):
+                dist = math.sqrt((ax-xs[i])**2+(ay-ys[i])**2)
+                if dist > dmax:
+                    idmax = i
+                    dmax = dist
+        else:
+            dmax,idmax = tree.farthest(a+1,b-1,ax,ay,(ay-by)/d,(bx-ax)/d)
+        if dmax > approx:
+            keep[idmax] = 1
+            stack.append((idmax,b))
+            stack.append((a,idmax))
+    return keep
+
+_gauss_legendre_table = {}
+
+def _gauss_legendre(n):
+    """
+    return the lists of the nodes and weights of the n points Gauss-Legendre quadrature on [-1,1]
+    the nodes are the roots of the Legendre polynomial P(n), found by Newton's method
+    the lists are computed once for each n
+
+    Examples
+
+    >>> x,w = _gauss_legendre(2)
+    >>> print([round(item,6) for item in x],[round(item,6) for item in w])
+    [0.57735, -0.57735] [1.0, 1.0]
+    """
+    try:
+        return _gauss_legendre_table[n]
+    except KeyError:
+        nodes = []
+        weights = []
+        for i in range(1,n+1):
+            x = math.cos(math.pi*(i-0.25)/(n+0.5))
+            for k in range(100):
+                p0,p1 = 1.0,x
+                for j in range(2,n+1):
+                    p0,p1 = p1,((2*j-1)*x*p1-(j-1)*p0)/float(j)
+                dp = n*(x*p1-p0)/(x*x-1) if n > 1 else 1.0
+                dx = p1/dp
+                x -= dx
+                if abs(dx) < 1e-15:
+                    break
+            nodes.append(x)
+            weights.append(2/((1-x*x)*dp*dp))
+        _gauss_legendre_table[n] = (nodes,weights)
+        return nodes,weights
+
 def _choose(i,n):
     """
     return the number of ways of picking i unordered outcomes from n possibilities.
@@ -88,6 +576,24 @@ def _choose(i,n):
      """
     return math.factorial(n)/(math.factorial(i)*math.factorial(n-i))
 
+_binomial_table = {}
+
+def _binomials(n):
+    """
+    return the list of the binomial coefficients _choose(i,n) for i from 0 to n
+    the lists are computed once for each n
+
+    Examples
+
+    >>> print(_binomials(3))
+    [1.0, 3.0, 3.0, 1.0]
+    """
+    try:
+        return _binomial_table[n]
+    except KeyError:
+        row = _binomial_table[n] = [_choose(i,n) for i in range(n+1)]
+        return row
+
 def _subst_ns(tag):
     """
     transform a dict or a tag in domain:tag format to {domain}tag
@@ -199,23 +705,22 @@ def _get_dic(dic):
             param[_subst_ns(key)] = _get_dic(value)
     return param
 
-def _get_path(node,pathList = []):
+def _style_dict(text):
     """
-    return a path list from a svg type xml tree
-    to be completed
+    return the dictionary of a svg style attribute
+
+    Example:
+
+    >>> s = _style_dict('fill:none; stroke:#ff0000;stroke-width:0.3mm;')
+    >>> print(sorted(s.items()))
+    [('fill', 'none'), ('stroke', '#ff0000'), ('stroke-width', '0.3mm')]
     """
-    for subNode in node:
-        if subNode.tag == _subst_ns('svg:g'):
-            _get_path(subNode,pathList)
-        if subNode.tag == _subst_ns('svg:path'):
-            params = {'id':subNode.get('id'),'color':[255,0,0]}
-            style = subNode.get('style')
-            if style:
-                rvb = re.search('stroke:#([0-9|A-F|a-f]{2})([0-9|A-F|a-f]{2})([0-9|A-F|a-f]{2})',style)
-                if rvb:
-                    params['color'] = [int(x,base=16) for x in rvb.groups()]
-            pathList.append(params)
-    return pathList
+    style = {}
+    for item in text.split(';'):
+        if ':' in item:
+            key,value = item.split(':',1)
+            style[key.strip()] = value.strip()
+    return style
 
 class DTree(object):
     """
@@ -403,9 +908,9 @@ class TransformMatrix(object):
     11 5
     """
 
-    re_translate = '^[ ]*translate\((-?[0-9]+[.]?[0-9]*[e]?-?[0-9]*,-?[0-9]+[.]?[0-9]*[e]?-?[0-9]*)\)'
-    re_matrix = '^[ ]*matrix\((-?[0-9]+[.]?[0-9]*[e]?-?[0-9]*(,-?[0-9]+[.]?[0-9]*[e]?-?[0-9]*){5})\)'
     nullDeterminant = 1e-5
+    textCacheSize = 256 ## number of matrices kept by from_text, the least recently used is dropped
+    _textCache = OrderedDict() ## transform string : matrix tuple
 
     def __init__(self,matrix = None):
         """
@@ -657,33 +1162,86 @@ class TransformMatrix(object):
     def from_text(self,text):
         """
         translate a string to a transformation matrix
-        text is a string wich is a list of transformation separated by spaces
+        text is a string wich is a list of transformation separated by spaces or commas
         transformations order are from right to left
-        available transformations are :
-        translate(a,b)
+        available transformations are (angles in degrees) :
         matrix(a,b,c,d,e,f)
+        translate(x[,y])
+        scale(x[,y])
+        rotate(angle[,cx,cy])
+        skewX(angle)
+        skewY(angle)
         compatible with Inkscape transform field
+        raise ValueError if a transformation is unknown or has wrong parameters
+        the last TransformMatrix.textCacheSize read strings are kept with their matrix
+        return the TransformMatrix
 
         Example:
 
         >>> t = TransformMatrix().from_text('translate(12,5) matrix(2,0,0,2,0,0)')
         >>> print(t.get())
         [2.0, 0.0, 0.0, 2.0, 12.0, 5.0]
+        >>> t = TransformMatrix().from_text('rotate(90 1 1), scale(2)')
+        >>> print([round(x,2)+0 for x in t.get()])
+        [0.0, 2.0, -2.0, 0.0, 2.0, 0.0]
+        >>> t = TransformMatrix().from_text('translate(3) skewX(45)')
+        >>> print([round(x,2) for x in t.get()])
+        [1.0, 0.0, 1.0, 1.0, 3.0, 0.0]
+        >>> t = TransformMatrix().from_text('perspective(2)')
+        Traceback (most recent call last):
+        ...
+        ValueError: unknown transformation : perspective(2)
         """
 
-        s = re.search(TransformMatrix.re_translate,text)
-        if s:
-            param = [float(item) for item in s.group(1).split(',')]
-            m = TransformMatrix().translation(Vector(param[0],param[1]))
-            e = TransformMatrix().from_text(text[s.span()[1]:])
-            self.matrix = m.mul(e).matrix
-        s = re.search(TransformMatrix.re_matrix,text)
-        if s:
-            m = TransformMatrix().set([float(item) for item in s.group(1).split(',')])
-            e = TransformMatrix().from_text(text[s.span()[1]:])
-            self.matrix = m.mul(e).matrix
+        cache = TransformMatrix._textCache
+        matrix = cache.pop(text,None)
+        if matrix is None:
+            matrix = tuple(_parse_transform(text).matrix)
+        cache[text] = matrix ## the last used matrix is at the end
+        if len(cache) > TransformMatrix.textCacheSize:
+            cache.popitem(last = False)
+        self.matrix = list(matrix)
         return self
 
+def _parse_transform(text):
+    """
+    return the TransformMatrix of a svg transform attribute
+    raise ValueError if a term can not be read
+    """
+    terms = []
+    pos = 0
+    for s in _re_svg_transform.finditer(text):
+        if not _re_svg_separator.match(text[pos:s.start()]):
+            break
+        pos = s.end()
+        name = s.group(1)
+        args = s.group(2)
+        if not _re_svg_separator.match(_re_svg_number.sub(' ',args)):
+            raise ValueError('invalid transformation : %s' % s.group(0).strip(' ,'))
+        param = [float(item) for item in _re_svg_number.findall(args)]
+        if len(param) not in _svg_transform_args[name]:
+            raise ValueError('invalid transformation : %s' % s.group(0).strip(' ,'))
+        if name == 'matrix':
+            m = TransformMatrix().set(param)
+        elif name == 'translate':
+            m = TransformMatrix().translation(Vector(param[0],param[1] if len(param) == 2 else 0.0))
+        elif name == 'scale':
+            m = TransformMatrix().scaling(param[0],param[-1])
+        elif name == 'rotate':
+            center = Point(param[1],param[2]) if len(param) == 3 else Point(0.0,0.0)
+            m = TransformMatrix().rotation(center,math.radians(param[0]))
+        elif name == 'skewX':
+            m = TransformMatrix().set([1,0,math.tan(math.radians(param[0])),1,0,0])
+        else:
+            m = TransformMatrix().set([1,math.tan(math.radians(param[0])),0,1,0,0])
+        terms.append(m)
+    if not _re_svg_separator.match(text[pos:]):
+        raise ValueError('unknown transformation : %s' % text[pos:].strip(' ,'))
+    matrix = TransformMatrix()
+    for m in reversed(terms): ## from right to left as in the svg transform list
+        matrix = m.mul(matrix)
+    return matrix
+
 class Coord(object):
     """
     2D coordinates object
@@ -697,7 +1255,8 @@ class Coord(object):
     """
 
     nullDistance = 1e-5
-    
+    __slots__ = ('x','y') ## no instance dictionary : points are created by millions
+
     def __init__(self,x = 0,y = 0):
         """
         create an object with cartesian coordinates (x,y)
@@ -710,7 +1269,8 @@ class Coord(object):
         1
         """
 
-        self.set(x,y)
+        self.x = x
+        self.y = y
 
     def set(self,x,y):
         """
@@ -786,6 +1346,8 @@ class Vector(Coord):
     0.8 0.6
     """
 
+    __slots__ = ()
+
     def copy(self):
         """
         return a copy of the vector
@@ -831,6 +1393,8 @@ class Point(Coord):
     6.403
     """
 
+    __slots__ = ()
+
     def copy(self):
         """
         return a copy of the point
@@ -1760,10 +2324,12 @@ class NodeCurve(GObj):
         self.nodes = []
         return self
 
-    def add_node(self,p):
+    def add_node(self,p,copy = True):
         """
         add a copy of the point to the nodes list
         p is a Point or a list of point
+        if copy is False, the points themselves are added : the curve takes
+        ownership of them and they must not be shared with another object
         return the object
 
         Example:
@@ -1773,18 +2339,27 @@ class NodeCurve(GObj):
         >>> p.add_node([Point(4,5),Point(7,-3),Point(8,2)])
         >>> print([(item.x,item.y) for item in p.get_nodes()])
         [(3, -2), (4, 5), (7, -3), (8, 2)]
+        >>> q = Point(1,1)
+        >>> print(p.add_node(q,copy=False).end() is q)
+        True
         """
         if type(p) == list or type(p)==tuple:
+            if copy:
                 for item in p:
                     self.nodes.append(item.copy())
-        else:
+            else:
+                self.nodes.extend(p)
+        elif copy:
             self.nodes.append(p.copy())
+        else:
+            self.nodes.append(p)
         return self
 
-    def append(self,curve):
+    def append(self,curve,copy = True):
         """
         Append the curve with a same type cuve
         curve must begin at the end of the object
+        if copy is False, the nodes of curve are moved to the object
         return True if possible and done
         else return False
    
@@ -1806,9 +2381,7 @@ class NodeCurve(GObj):
                 if self.end().distance(curve.start()) > Coord.nullDistance:
                     return False
                 start = 1
-            n = curve.get_nodes()
-            for i in range(start,len(n)):
-                self.add_node(n[i])
+            self.add_node(curve.get_nodes()[start:],copy)
             return True
         else:
             return False
@@ -1827,6 +2400,51 @@ class NodeCurve(GObj):
         self.nodes.reverse()
         return self
 
+    def from_coords(self,xs,ys):
+        """
+        set the nodes list from two sequences of coordinates
+        xs and ys are sequences of numbers with the same length
+        return the object
+
+        Example:
+
+        >>> p = Polyline().from_coords([4,6,3],[3,1,-2])
+        >>> print([(item.x,item.y) for item in p.get_nodes()])
+        [(4, 3), (6, 1), (3, -2)]
+        """
+        self.nodes = [Point(x,y) for x,y in zip(xs,ys)]
+        return self
+
+    def from_flat(self,coords):
+        """
+        set the nodes list from a flat sequence of coordinates x0,y0,x1,y1,...
+        return the object
+
+        Example:
+
+        >>> c = BCurve().from_flat([0,0,1,0,2,1,3,1])
+        >>> print([(item.x,item.y) for item in c.get_nodes()])
+        [(0, 0), (1, 0), (2, 1), (3, 1)]
+        """
+        self.nodes = [Point(x,y) for x,y in zip(coords[0::2],coords[1::2])]
+        return self
+
+    def to_flat(self):
+        """
+        return the nodes coordinates as a flat list x0,y0,x1,y1,...
+
+        Example:
+
+        >>> p = Polyline().from_coords([4,6,3],[3,1,-2])
+        >>> print(p.to_flat())
+        [4, 3, 6, 1, 3, -2]
+        """
+        coords = []
+        for p in self.nodes:
+            coords.append(p.x)
+            coords.append(p.y)
+        return coords
+
     def get_nodes(self):
         """
         return the nodes list
@@ -2021,6 +2639,8 @@ class Polyline(NodeCurve):
 
     """
 
+    hullSimplify = 0 ## nodes number from wich to_polyline uses the convex hulls Douglas-Peucker (0 : never)
+
     def copy(self):
         """
         return a copy of the polyline
@@ -2060,12 +2680,17 @@ class Polyline(NodeCurve):
             bbox.add_point(p)
         return bbox
 
-    def to_polyline(self,approx = 0):
+    def to_polyline(self,approx = 0,flatten = 'sample',simplify = 'dp',count = None):
         """
         return an approx polyline of the object
         approx is the max distance to erase a node (default:0)
+        flatten has no effect (defined for compatibility with BCurve)
+        simplify is the simplification method
+         'dp' : Douglas-Peucker (default)
+         'vw' : Visvalingam-Whyatt, erase the nodes with an effective area less than approx**2
+        count is the max number of nodes, only with 'vw' (default: None, no limit)
 
-        if approx > 0 then simplify the polyline
+        if approx > 0 or count is given then simplify the polyline
         else has no effect
         return the polyline
 
@@ -2078,8 +2703,22 @@ class Polyline(NodeCurve):
         >>> q = p.to_polyline(0.5)
         >>> print([(item.x,item.y) for item in q.get_nodes()])
         [(4, 3), (3, -2)]
+        >>> q = p.to_polyline(simplify='vw',count=2)
+        >>> print([(item.x,item.y) for item in q.get_nodes()])
+        [(4, 3), (3, -2)]
         """
-        if approx > 0:
+        if simplify not in ('dp','vw'):
+            raise ValueError('unknown simplify method : %s' % simplify)
+        if count is not None and simplify != 'vw':
+            raise ValueError('count needs vw simplify method')
+        if simplify == 'vw' and (approx > 0 or count is not None):
+            keep = _visvalingam([p.x for p in self.nodes],[p.y for p in self.nodes],approx**2,count)
+            p = Polyline()
+            for i in range(len(self.nodes)):
+                if keep[i]:
+                    p.add_node(self.nodes[i])
+            return p
+        elif approx > 0:
             p = Polyline()
             l = self._simplify(approx)
             for node in l:
@@ -2088,29 +2727,26 @@ class Polyline(NodeCurve):
         else:
             return self.copy()
 
-    def _simplify(self,approx=1e-3,a=0,b=-1):
+    def _simplify(self,approx=1e-3,a=0,b=-1,hull=None):
         """
-        simplify a polyline
+        simplify a polyline (Douglas-Peucker)
+        hull is True to use the convex hulls version (see _douglas_peucker_hull)
+        None (default) to use it when there are more than Polyline.hullSimplify nodes
         return a list of non erased nodes
         """
         if b == -1:
             b = len(self.nodes)-1
-        dmax = 0
-        idmax = 0
-        l = Line(self.nodes[a],self.nodes[b],False)
-        for i in range(a+1,b):
-            d = l.distance(self.nodes[i])
-            if d > dmax:
-                idmax = i
-                dmax = d
-        if dmax > approx:
-            left = self._simplify(approx,a,idmax)
-            right = self._simplify(approx,idmax,b)
-##            left[len(left):] = right[1:]
-            left.extend(right[1:])
-            return left
-        else:
+        if a == b:
             return [self.nodes[a],self.nodes[b]]
+        if hull is None:
+            hull = Polyline.hullSimplify > 0 and b-a >= Polyline.hullSimplify
+        xs = [p.x for p in self.nodes]
+        ys = [p.y for p in self.nodes]
+        if hull:
+            keep = _douglas_peucker_hull(xs,ys,approx,a,b)
+        else:
+            keep = _douglas_peucker(xs,ys,approx,a,b)
+        return [self.nodes[i] for i in range(a,b+1) if keep[i]]
 
 class BCurve(NodeCurve):
     """
@@ -2125,6 +2761,9 @@ class BCurve(NodeCurve):
     3.25 0.75
     """
     
+    maxDepth = 16 ## max number of halvings in adaptive to_polyline
+    strictApprox = False ## True : sampled to_polyline error always under approx, but with more nodes
+
     def __init__(self,order = 3):
         """
         Init the bezier curve
@@ -2135,6 +2774,7 @@ class BCurve(NodeCurve):
         """
         NodeCurve.__init__(self)
         self.order = order
+        self._length = None ## (key,length) cache of length
 
     def get_order(self):
         """
@@ -2142,6 +2782,22 @@ class BCurve(NodeCurve):
         """
         return self.order
 
+    def append(self,curve,copy = True):
+        """
+        Append the curve with a same order bezier curve
+        see NodeCurve.append
+
+        Example:
+
+        >>> p = BCurve().add_node([Point(4,3),Point(4,1),Point(3,0),Point(1,0)])
+        >>> q = BCurve(2).add_node([Point(1,0),Point(0,1),Point(2,2)])
+        >>> print(p.append(q))
+        False
+        """
+        if type(curve) == BCurve and curve.order != self.order:
+            return False
+        return NodeCurve.append(self,curve,copy)
+
     def copy(self):
         """
         return a copy of the bezier curve
@@ -2215,25 +2871,43 @@ class BCurve(NodeCurve):
 
     def length(self,n = 5):
         """
-        return an approximate length of the Bezier curve using n points for each bezier curve
-        n is an integer
+        return the length of the Bezier curve
+        the derivative norm is integrated with the n points Gauss-Legendre quadrature
+        on each bezier curve, n is the accuracy (exact for polynomials of degree 2*n-1)
+        the length is kept until the nodes change
 
         Example :
         
         >>> c = BCurve().add_node([Point(2,1),Point(4,3),Point(3,5),Point(2,4)])
-        >>> print(round(c.length(),2))
-        4.46
-        >>> print(round(c.length(20),2))
+        >>> print(round(c.length(),3))
         4.52
-        """
-        nb = n*self.path_len()
-        step = 1.0/n ## pour python 2.x
+        >>> print(round(c.length(20),3))
+        4.521
+        """
+        key = (n,tuple(self.to_flat()))
+        if self._length and self._length[0] == key:
+            return self._length[1]
+        o = self.order
+        binom = _binomials(o-1)
+        ts,ws = _gauss_legendre(n)
+        ts = [(t+1)*0.5 for t in ts]
+        ws = [w*0.5 for w in ws]
         d = 0
-        o = self.start()
-        for i in range(nb):
-            e = self.get((i+1)*step)
-            d += o.distance(e)
-            o = e
+        for k in range(self.path_len()):
+            nodes = self.nodes[o*k:o*k+o+1]
+            ## derivative control points
+            dxs = [o*(nodes[i+1].x-nodes[i].x) for i in range(o)]
+            dys = [o*(nodes[i+1].y-nodes[i].y) for i in range(o)]
+            for t,w in zip(ts,ws):
+                s = 1-t
+                dx = 0
+                dy = 0
+                for i in range(o):
+                    c = binom[i]*t**i*s**(o-1-i)
+                    dx += c*dxs[i]
+                    dy += c*dys[i]
+                d += w*math.sqrt(dx*dx+dy*dy)
+        self._length = (key,d)
         return d
 
     def bounding_box(self):
@@ -2245,18 +2919,19 @@ class BCurve(NodeCurve):
             bbox.add_point(self.nodes[i*self.order])
         bbox.add_point(self.nodes[-1])
 
+        ts = []
         if self.order == 2:
             for i in range(self.path_len()):
                 d = self.nodes[self.order*i].x + self.nodes[self.order*i+2].x - 2*self.nodes[self.order*i+1].x
                 if abs(d) > 1e-5:
                     t = (self.nodes[self.order*i].x - self.nodes[self.order*i+1].x)/d
                     if t > 0 and t < 1:
-                        bbox.add_point(self.get(i+t))
+                        ts.append(i+t)
                 d = self.nodes[self.order*i].y + self.nodes[self.order*i+2].y - 2*self.nodes[self.order*i+1].y
                 if abs(d) > 1e-5:
                     t = (self.nodes[self.order*i].y - self.nodes[self.order*i+1].y)/d
                     if t > 0 and t < 1:
-                        bbox.add_point(self.get(i+t))
+                        ts.append(i+t)
         elif self.order == 3:
             for i in range(self.path_len()):
                 a = self.nodes[self.order*i+3].x - 3*self.nodes[self.order*i+2].x + 3*self.nodes[self.order*i+1].x - self.nodes[self.order*i].x
@@ -2267,14 +2942,14 @@ class BCurve(NodeCurve):
                     if delta >= 0:
                         t = (-b-math.sqrt(delta))/(2.0*a)
                         if t > 0 and t < 1:
-                            bbox.add_point(self.get(i+t))
+                            ts.append(i+t)
                         t = (-b+math.sqrt(delta))/(2.0*a)
                         if t > 0 and t < 1:
-                            bbox.add_point(self.get(i+t))
+                            ts.append(i+t)
                 elif abs(b) > 1e-6:
                     t = -1.0*c/b
                     if t > 0 and t < 1:
-                        bbox.add_point(self.get(i+t))
+                        ts.append(i+t)
                     
                 a = self.nodes[self.order*i+3].y - 3*self.nodes[self.order*i+2].y + 3*self.nodes[self.order*i+1].y - self.nodes[self.order*i].y
                 b = 2*self.nodes[self.order*i+2].y - 4*self.nodes[self.order*i+1].y + 2*self.nodes[self.order*i].y
@@ -2284,42 +2959,120 @@ class BCurve(NodeCurve):
                     if delta >= 0:
                         t = (-b-math.sqrt(delta))/(2.0*a)
                         if t > 0 and t < 1:
-                            bbox.add_point(self.get(i+t))
+                            ts.append(i+t)
                         t = (-b+math.sqrt(delta))/(2.0*a)
                         if t > 0 and t < 1:
-                            bbox.add_point(self.get(i+t))
+                            ts.append(i+t)
                 elif abs(b) > 1e-6:
                     t = -1.0*c/b
                     if t > 0 and t < 1:
-                        bbox.add_point(self.get(i+t))
+                        ts.append(i+t)
         elif self.order >= 4:
             raise NotImplementedError("not yet implemented")
+        for p in self.get_many(ts):
+            bbox.add_point(p)
         return bbox
 
-    def to_polyline(self,approx = 5e-2):
+    def to_polyline(self,approx = 5e-2,flatten = 'sample',simplify = 'dp',count = None):
         """
         Return a Polyline wich approximate the bezier curve
         approx is maximum distance between the curve and the polyline
+        flatten is the method used
+         'sample' : sample the curve then simplify the polyline (default)
+                    the error may exceed approx a little, unless BCurve.strictApprox
+         'adaptive' : cut each bezier curve in halves until it is close to its chord (fewer nodes)
+        simplify and count are the simplification parameters (see Polyline.to_polyline)
         
         Example:
 
         >>> p = BCurve().add_node([Point(4,3),Point(4,1),Point(3,0),Point(1,0)])
         >>> q = p.to_polyline(0.2)
+        >>> print([(round(item.x,3),round(item.y,3)) for item in q.get_nodes()])
+        [(4.0, 3.0), (3.25, 0.75), (1, 0)]
+        >>> BCurve.strictApprox = True
+        >>> q = p.to_polyline(0.2)
+        >>> print([(round(item.x,3),round(item.y,3)) for item in q.get_nodes()])
+        [(4.0, 3.0), (3.88, 1.92), (3.52, 1.08), (2.92, 0.48), (1, 0)]
+        >>> BCurve.strictApprox = False
+        >>> q = p.to_polyline(0.2,'adaptive')
         >>> print([(item.x,item.y) for item in q.get_nodes()])
-        [(4.0, 3.0), (3.8125, 1.6875), (3.25, 0.75), (2.3125, 0.1875), (1.0, 0.0)]
-        """
-        n = max(int(self.length()/(2.0*approx)),5) ## at least 5 points
-##        step = self.path_len()/n ## pour python 3
-        step = self.path_len()/float(n) ## python 2.x
-
+        [(4, 3), (3.8125, 1.6875), (3.25, 0.75), (2.3125, 0.1875), (1, 0)]
+        """
+        if flatten == 'adaptive':
+            l = Polyline().from_flat(self._adaptive(approx))
+            if count is None:
+                return l
+            return l.to_polyline(0,simplify = simplify,count = count)
+        elif flatten != 'sample':
+            raise ValueError('unknown flatten method : %s' % flatten)
+        sampleApprox,simplifyApprox = self._approx_shares(approx)
         l = Polyline()
-        for i in range(n):
-            try:
-                l.add_node(self.get(i*step))
-            except:
-                break
+        l.add_node(self.get_many(self._sample_params(sampleApprox)),copy=False)
         l.add_node(self.end())
-        return l.to_polyline(approx)
+        return l.to_polyline(simplifyApprox,simplify = simplify,count = count)
+
+    def _approx_shares(self,approx):
+        """
+        return the sampling and simplification errors of the sampled to_polyline
+        by default the sampling bound (see _sample_params) is a worst case : with
+        1.5*approx for it and approx for the simplification, the error may exceed
+        approx a little but the polyline has few nodes and few samples
+        with BCurve.strictApprox, a quarter of approx for the sampling and the rest
+        for the simplification keep the error under approx, with about 17% more nodes
+        """
+        if BCurve.strictApprox:
+            return (approx/4.0,approx*0.75)
+        return (approx*1.5,approx)
+
+    def _sample_params(self,approx):
+        """
+        return the parameters of the sampled points of to_polyline, end excluded
+        each bezier curve is cut in n equal parameter steps : the distance between
+        a chord and the curve is at most M/(8*n**2) where
+        M = order*(order-1)*max(|P(j+2)-2*P(j+1)+P(j)|) bounds the second derivative
+        """
+        o = self.order
+        ts = []
+        for k in range(self.path_len()):
+            nodes = self.nodes[o*k:o*k+o+1]
+            m = 0
+            for j in range(o-1):
+                m = max(m,math.sqrt((nodes[j+2].x-2*nodes[j+1].x+nodes[j].x)**2+(nodes[j+2].y-2*nodes[j+1].y+nodes[j].y)**2))
+            n = max(int(math.ceil(math.sqrt(o*(o-1)*m/(8.0*approx)))),1)
+            ts.extend([k+i/float(n) for i in range(n)]) ## python 2.x
+        return ts
+
+    def _adaptive(self,approx):
+        """
+        return the flat coordinates list of a polyline wich approximate the bezier curve
+        each bezier curve is cut in two halves (de Casteljau) until it is
+        within approx of its chord (see _bezier_flat)
+        """
+        o = self.order
+        coords = [self.nodes[0].x,self.nodes[0].y]
+        for k in range(self.path_len()):
+            stack = [([(p.x,p.y) for p in self.nodes[o*k:o*k+o+1]],0)]
+            while stack:
+                pts,depth = stack.pop()
+                ax,ay = pts[0]
+                bx,by = pts[-1]
+                flat = True
+                if depth < BCurve.maxDepth:
+                    flat = _bezier_flat(pts,approx)
+                if flat:
+                    coords.append(bx)
+                    coords.append(by)
+                else:
+                    left = [pts[0]]
+                    right = [pts[-1]]
+                    while len(pts) > 1:
+                        pts = [((pts[i][0]+pts[i+1][0])*0.5,(pts[i][1]+pts[i+1][1])*0.5) for i in range(len(pts)-1)]
+                        left.append(pts[0])
+                        right.append(pts[-1])
+                    right.reverse()
+                    stack.append((right,depth+1))
+                    stack.append((left,depth+1))
+        return coords
 
     def get(self,t):
         """
@@ -2336,21 +3089,60 @@ class BCurve(NodeCurve):
         >>> print(m.x,m.y)
         3.25 0.75
         """
-        if t > self.path_len():
-            raise ValueError('{val} exceeds max : {vmax}'.format(val = t, vmax = self.path_len()))
-        else:
+        o = self.order
+        nb = self.path_len()
+        if t > nb:
+            raise ValueError('{val} exceeds max : {vmax}'.format(val = t, vmax = nb))
+        p = int(t)
+        if p == nb:
+            p -= 1
+        t -= p
+        s = 1-t
+        binom = _binomials(o)
+        nodes = self.nodes[o*p:o*p+o+1] ## only the nodes of the bezier curve of t
+        x = 0
+        y = 0
+        for i in range(o+1):
+            c = binom[i]*t**i*s**(o-i)
+            x += c*nodes[i].x
+            y += c*nodes[i].y
+        return Point(x,y)
+
+    def get_many(self,ts):
+        """
+        Return the list of the points of parameters ts in the bezier curve
+        same result as [self.get(t) for t in ts] but the binomial coefficients
+        and the nodes coordinates of the whole curve are read once for all the parameters
+
+        Example:
+
+        >>> p = BCurve().add_node([Point(4,3),Point(4,1),Point(3,0),Point(1,0)])
+        >>> print([(m.x,m.y) for m in p.get_many([0,0.5,1])])
+        [(4.0, 3.0), (3.25, 0.75), (1.0, 0.0)]
+        """
+        o = self.order
+        nb = self.path_len()
+        binom = _binomials(o)
+        xs = [p.x for p in self.nodes]
+        ys = [p.y for p in self.nodes]
+        points = []
+        for t in ts:
+            if t > nb:
+                raise ValueError('{val} exceeds max : {vmax}'.format(val = t, vmax = nb))
             p = int(t)
-            if p == self.path_len():
+            if p == nb:
                 p -= 1
             t -= p
-
+            s = 1-t
+            k = o*p
             x = 0
             y = 0
-            for i in range(self.order+1):
-                c = _choose(i,self.order)*t**i*(1-t)**(self.order-i)
-                x += c*self.nodes[self.order*p+i].x
-                y += c*self.nodes[self.order*p+i].y
-            return Point(x,y)
+            for i in range(o+1):
+                c = binom[i]*t**i*s**(o-i)
+                x += c*xs[k+i]
+                y += c*ys[k+i]
+            points.append(Point(x,y))
+        return points
 
 class Arc(GObj):
     """
@@ -2370,6 +3162,7 @@ class Arc(GObj):
         >>> a = Arc(Point(1,0),5,4,0,0,math.pi/4)
         """
         self.set(center,rx,ry,ax,a1,a2)
+        self._length = None ## (key,length) cache of length
 
 
     def set(self,center,rx,ry,ax,a1,a2):
@@ -2402,10 +3195,11 @@ class Arc(GObj):
         arc = Arc(self.center,self.rx,self.ry,self.ax,self.a1,self.a2)
         return arc
 
-    def append(self,arc):
+    def append(self,arc,copy = True):
         """
         append arc if arc continues the object with same parameters 
         arc is an Arc
+        copy, useless here, is defined for compatibility with NodeCurve.append
         return True if arc is added to the the object
         return False if impossible to do
 
@@ -2445,20 +3239,34 @@ class Arc(GObj):
 
     def length(self,n = 5):
         """
-        return an approximate length of the elliptical arc using n points
-        n is an integer
+        return the length of the elliptical arc
+        the speed sqrt((rx*sin(a))**2+(ry*cos(a))**2) is integrated with the n points
+        Gauss-Legendre quadrature on pieces of at most pi/2, n is the accuracy
+        the length is kept until the arc parameters change
 
         Example :
         
         >>> a = Arc(Point(2,3),4,2,0,0,math.pi/2)
-        >>> print(round(a.length(),2))
-        4.81
-        >>> print(round(a.length(20),2))
-        4.84
-        """
+        >>> print(round(a.length(),4))
+        4.8442
+        >>> print(round(a.length(20),4))
+        4.8442
+        """
+        key = (n,self.rx,self.ry,self.a1,self.a2)
+        if self._length and self._length[0] == key:
+            return self._length[1]
+        ts,ws = _gauss_legendre(n)
+        da = self.a2-self.a1
+        pieces = max(int(math.ceil(abs(da)/(math.pi/2))),1)
+        h = da/float(pieces)
         l = 0
-        for i in range(n-1):
-            l += self.get(self.a1+(self.a2-self.a1)*i/float(n-1)).distance(self.get(self.a1+(self.a2-self.a1)*(i+1)/float(n-1)))
+        for k in range(pieces):
+            a0 = self.a1+k*h
+            for t,w in zip(ts,ws):
+                a = a0+(t+1)*0.5*h
+                l += w*math.sqrt((self.rx*math.sin(a))**2+(self.ry*math.cos(a))**2)
+        l = abs(l*0.5*h)
+        self._length = (key,l)
         return l
 
     def start(self):
@@ -2560,24 +3368,51 @@ class Arc(GObj):
 
         return bbox
 
-    def to_polyline(self,approx = 5e-2):
+    def to_polyline(self,approx = 5e-2,flatten = 'sample',simplify = 'dp',count = None):
         """
         Return a Polyline wich approximate the
         approx is maximum distance between the curve and the polyline
+        flatten has no effect (defined for compatibility with BCurve)
+        simplify and count are the simplification parameters (see Polyline.to_polyline)
+        the arc is the image of a unit circle arc by an affine map wich scales at most by
+        max(rx,ry) : n equal angle steps give chords within approx of the arc, without simplification
 
         Example:
 
         >>> a = Arc(Point(2,3),4,2,0,0,math.pi/2)
         >>> p = a.to_polyline(0.1)
         >>> print([(round(item.x,2),round(item.y,2)) for item in p.get_nodes()])
-        [(6.0, 3.0), (5.78, 3.66), (4.83, 4.41), (3.74, 4.8), (2.0, 5.0)]
-        """
-        n = int(2*math.ceil(abs(self.a2-self.a1)*max(self.rx,self.ry)/(2*math.acos(1-approx/min(self.rx**2/float(self.ry),self.ry**2/float(self.rx))))))
-        p = Polyline()
+        [(6.0, 3.0), (5.7, 3.77), (4.83, 4.41), (3.53, 4.85), (2.0, 5.0)]
+        """
+        da = self.a2-self.a1
+        r = max(self.rx,self.ry)
+        step = math.pi/2 ## max angle step
+        if approx < r:
+            step = min(step,2*math.acos(1-approx/float(r)))
+        n = max(int(math.ceil(abs(da)/step)),1)
+        ## unit circle point rotated by da/n at each step
+        cd = math.cos(da/n)
+        sd = math.sin(da/n)
+        c = math.cos(self.a1)
+        s = math.sin(self.a1)
+        ux = math.cos(self.ax)*self.rx
+        uy = math.sin(self.ax)*self.rx
+        vx = -math.sin(self.ax)*self.ry
+        vy = math.cos(self.ax)*self.ry
+        cx = self.center.x
+        cy = self.center.y
+        coords = []
         for i in range(n):
-            p.add_node(self.get(self.a1+i*(self.a2-self.a1)/n))
-        p.add_node(self.end())
-        return p.to_polyline(approx)
+            coords.append(cx+ux*c+vx*s)
+            coords.append(cy+uy*c+vy*s)
+            c,s = c*cd-s*sd,s*cd+c*sd
+        end = self.end()
+        coords.append(end.x)
+        coords.append(end.y)
+        p = Polyline().from_flat(coords)
+        if count is not None:
+            return p.to_polyline(0,simplify = simplify,count = count)
+        return p
 
     def translate(self,v):
         """
@@ -2713,17 +3548,17 @@ def _link(a,b,curveType ='bcurve',smooth = None):
         return None
     elif curveType == 'bcurve':
         s = BCurve()
-        s.add_node(a.end().copy())
+        s.add_node(a.end())
         l *= smooth
-        s.add_node(Point(a.end().x+l*a.end_vector().x,a.end().y+l*a.end_vector().y))
-        s.add_node(Point(b.start().x-l*b.start_vector().x,b.start().y-l*b.start_vector().y))
-        s.add_node(b.start().copy())
+        s.add_node(Point(a.end().x+l*a.end_vector().x,a.end().y+l*a.end_vector().y),copy=False)
+        s.add_node(Point(b.start().x-l*b.start_vector().x,b.start().y-l*b.start_vector().y),copy=False)
+        s.add_node(b.start())
         return s
     ###### add link with an arc
     else: ## line (polyline with 2 points) if curvetype != 'bcurve' and 'arc'
         s = Polyline()
-        s.add_node(a.end().copy())
-        s.add_node(b.start().copy())
+        s.add_node(a.end())
+        s.add_node(b.start())
         return s
 
 class SvgObj(object):
@@ -2789,17 +3624,43 @@ class Group(SvgObj):
         SvgObj.__init__(self,param)
 
     
+def _count_points(points,count):
+    """
+    return the (x,y) points iterator reduced to count points by Visvalingam-Whyatt
+    or points unchanged if count is None
+    """
+    if count is None:
+        return points
+    points = list(points)
+    keep = _visvalingam([x for x,y in points],[y for x,y in points],0,count)
+    return (points[j] for j in range(len(points)) if keep[j])
+
+def _close_points(points,start):
+    """
+    generator of the (x,y) points followed by the start Point
+    if the last one is not already on it
+    """
+    last = None
+    for last in points:
+        yield last
+    if last is not None and math.sqrt((last[0]-start.x)**2+(last[1]-start.y)**2) >= Coord.nullDistance:
+        yield (start.x,start.y)
+
 class Path(SvgObj):
     """
     Path made of subPaths composed by GObj
     """
 
+    flatCacheSize = 4 ## number of flattenings kept by each path (see iter_points)
+    scadChunk = 1024 ## number of points formatted at once by write_scad_poly
+
     def __init__(self,param = {'style':{'fill':'none','stroke':'#000000','stroke-width':'0.3mm'}}):
         """
         Init the path
         clear all subpaths
         """
         SvgObj.__init__(self,param)
+        self._flatCache = [] ## (key,subpaths points) list, see iter_points
         self.paths = []
 
     def clear_path(self):
@@ -2807,9 +3668,20 @@ class Path(SvgObj):
         clear all subpaths
         return the object
         """
+        self.clear_cache()
         self.paths = []
         return self
 
+    def clear_cache(self):
+        """
+        forget the flattened subpaths kept by iter_points
+        path methods call it when they change the curves, it must be called
+        after a direct change of the curves
+        return the object
+        """
+        self._flatCache = []
+        return self
+
     def copy(self):
         """
         return a copy of the path
@@ -2836,6 +3708,7 @@ class Path(SvgObj):
         >>> print(idx)
         0
         """
+        self.clear_cache()
         self.paths.append([])
         return len(self.paths)-1
         
@@ -2852,11 +3725,12 @@ class Path(SvgObj):
         """
         return len(self.paths)
         
-    def add(self,curve,subPath = -1):
+    def add(self,curve,subPath = -1,copy = True):
         """
-        add a curve in a subpath
+        add a copy of a curve in a subpath
         curve is a line, bezier curve, arc ...
         subpath is the subpath index (last by default)
+        if copy is False, the path takes ownership of curve (used for newly built curves)
         return the path
 
         Example:
@@ -2865,12 +3739,16 @@ class Path(SvgObj):
         >>> p.new_sub_path()
         >>> c = BCurve().add_node([Point(0,0),Point(1,0),Point(2,1),Point(3,1)])
         >>> p.add(c)
+        >>> d = Polyline().add_node([Point(3,1),Point(3,5)])
+        >>> print(p.add(d,copy=False).paths[-1][-1] is d)
+        True
         """
-        if len(self.paths[subPath]):
-            if not self.paths[subPath][-1].append(curve.copy()):
-                self.paths[subPath].append(curve.copy())
-        else:
-            self.paths[subPath].append(curve.copy())
+        self.clear_cache()
+        if len(self.paths[subPath]) and self.paths[subPath][-1].append(curve,copy):
+            return self
+        if copy:
+            curve = curve.copy()
+        self.paths[subPath].append(curve)
         return self
 
     def bounding_box(self):
@@ -2940,6 +3818,8 @@ class Path(SvgObj):
                 if self.paths[subPath][i].end().distance(self.paths[subPath][i+1].start()) > Coord.nullDistance:
                     sp.append(_link(self.paths[subPath][i],self.paths[subPath][i+1],curveType,smooth))
             sp.append(self.paths[subPath][l-1])
+        if len(sp) != l:
+            self.clear_cache()
         self.paths[subPath] = sp
         return self
 
@@ -2990,13 +3870,17 @@ class Path(SvgObj):
         if len(self.paths[subPath]):
             j = _link(self.paths[subPath][-1],self.paths[subPath][0],curveType,smooth)
             if j:
-                self.add(j,subPath)
+                self.add(j,subPath,copy=False)
         return self
 
-    def to_polyline(self,approx = 5e-2):
+    def to_polyline(self,approx = 5e-2,flatten = 'sample',simplify = 'dp',count = None,cache = True):
         """
         return a path in wich all subpaths are transformed to polyline
         approx is maximum distance between the curve and the polyline
+        flatten is the bezier curves method (see BCurve.to_polyline)
+        simplify is the simplification method (see Polyline.to_polyline)
+        count is the max number of nodes of each subpath, only with 'vw' (default: None, no limit)
+        cache False does not keep the flattening (see Path.iter_points)
 
         Example:
 
@@ -3006,17 +3890,105 @@ class Path(SvgObj):
         >>> p.add(d)
         >>> r = p.to_polyline(0.1)
         >>> print([(round(item.x,2),round(item.y,2)) for item in r.paths[-1][-1].get_nodes()])
-        [(3.0, 1.0), (4.37, 1.3), (5.75, 2.25), (6.7, 3.63), (7.0, 5.0)]
+        [(3.0, 1.0), (4.47, 1.34), (5.75, 2.25), (6.66, 3.53), (7, 5)]
+        >>> r = p.to_polyline(0.1,simplify='vw',count=4)
+        >>> print([(round(item.x,2),round(item.y,2)) for item in r.paths[-1][-1].get_nodes()])
+        [(3.0, 1.0), (4.47, 1.34), (6.66, 3.53), (7, 5)]
         """
         polyPath = Path()
-        for path in self.paths:
+        for points in self.iter_points(approx,flatten,simplify,count,cache = cache):
             polyPath.new_sub_path()
-            poly = Polyline()
-            for subpath in path:
-                r = poly.append(subpath.to_polyline(approx))
-            polyPath.add(poly)
+            polyPath.add(Polyline().add_node([Point(x,y) for x,y in points],copy=False),copy=False)
         return polyPath
 
+    def iter_points(self,approx = 5e-2,flatten = 'sample',simplify = 'dp',count = None,close = False,cache = True):
+        """
+        generator of the points of the polylines wich approximate the subpaths
+        the parameters and the points are the same as in to_polyline
+        but no polyline is built for the whole path
+        close True gives the points of the subpaths closed by a line to their start
+        (and linked by lines as after Path.close(i,'polyline')) but the path is not changed
+        the closing point is not in the count nodes
+        yield for each subpath an iterator of (x,y) tuples
+
+        the points of the last Path.flatCacheSize flattenings are kept until the path
+        changes : a new flattening with the same parameters reads them, closed or not
+        to keep them, each subpath is flattened in a list before it is yielded
+        with cache False or a 0 flatCacheSize, a new flattening is not kept
+        and its points are streamed from the curves
+        the closed points of a subpath with unlinked curves are never kept
+
+        Example:
+
+        >>> p = Path()
+        >>> p.new_sub_path()
+        >>> d = BCurve().add_node([Point(3,1),Point(5,1),Point(7,3),Point(7,5)])
+        >>> p.add(d)
+        >>> for points in p.iter_points(0.1):
+        ...     print([(round(x,2),round(y,2)) for x,y in points])
+        [(3.0, 1.0), (4.47, 1.34), (5.75, 2.25), (6.66, 3.53), (7, 5)]
+        >>> for points in p.iter_points(0.5,close=True):
+        ...     print([(round(x,2),round(y,2)) for x,y in points])
+        [(3.0, 1.0), (5.75, 2.25), (7, 5), (3, 1)]
+        """
+        if simplify not in ('dp','vw'):
+            raise ValueError('unknown simplify method : %s' % simplify)
+        if count is not None and simplify != 'vw':
+            raise ValueError('count needs vw simplify method')
+        key = (approx,flatten,simplify,count)
+        cached = None
+        for k,subPaths in self._flatCache:
+            if k == key:
+                cached = subPaths
+                break
+        store = cached is None and cache and Path.flatCacheSize > 0
+        subPaths = []
+        for i in range(len(self.paths)):
+            linked = not close or self.is_linked(i)
+            if cached is not None:
+                points = iter(cached[i])
+            elif linked or store:
+                points = _count_points(self._iter_subpath_points(i,approx,flatten,simplify),count)
+                if store:
+                    points = list(points)
+                    subPaths.append(points)
+                    points = iter(points)
+            if not linked: ## the unlinked curves are joined by lines, not skipped
+                points = _count_points(self._iter_subpath_points(i,approx,flatten,simplify,True),count)
+            elif close:
+                points = _close_points(points,self.paths[i][0].start())
+            yield points
+        if store:
+            self._flatCache.append((key,subPaths))
+            del self._flatCache[:-Path.flatCacheSize]
+
+    def _iter_subpath_points(self,i,approx,flatten,simplify,close = False):
+        """
+        generator of the (x,y) points of the polyline wich approximate the subpath i
+        as Polyline.append, a curve wich does not begin at the end of the previous one is skipped
+        with close, it is linked and closed by lines as in Path.close(i,'polyline')
+        """
+        curves = self.paths[i]
+        if close and len(curves) and curves[-1].end().distance(curves[0].start()) >= Coord.nullDistance:
+            if type(curves[-1]) == Polyline: ## the closing line is appended to the last polyline
+                curves = curves[:-1]+[curves[-1].copy().add_node(curves[0].start())]
+            else:
+                curves = curves+[Polyline().add_node([curves[-1].end(),curves[0].start()])]
+        last = None
+        for curve in curves:
+            nodes = curve.to_polyline(approx,flatten,simplify).nodes
+            if last is None:
+                start = 0
+            elif last.distance(nodes[0]) > Coord.nullDistance:
+                if not close:
+                    continue
+                start = 0
+            else:
+                start = 1
+            for q in nodes[start:]:
+                yield (q.x,q.y)
+            last = nodes[-1]
+
     def translate(self,v):
         """
         translate the path
@@ -3033,6 +4005,7 @@ class Path(SvgObj):
         >>> print([(round(item.x,2),round(item.y,2)) for item in p.paths[-1][-1].get_nodes()])
         [(5, 4), (7, 4), (9, 6), (9, 8)]
         """
+        self.clear_cache()
         for path in self.paths:
             for subpath in path:
                 subpath.translate(v)
@@ -3055,6 +4028,7 @@ class Path(SvgObj):
         >>> print([(round(item.x,2),round(item.y,2)) for item in p.paths[-1][-1].get_nodes()])
         [(1.0, 5.0), (1.0, 7.0), (-1.0, 9.0), (-3.0, 9.0)]
         """
+        self.clear_cache()
         for path in self.paths:
             for subpath in path:
                 subpath.rotate(center,angle)
@@ -3077,6 +4051,7 @@ class Path(SvgObj):
         >>> print([(round(item.x,2),round(item.y,2)) for item in p.paths[-1][-1].get_nodes()])
         [(5, 1), (9, 1), (13, 5), (13, 9)]
         """
+        self.clear_cache()
         for path in self.paths:
             for subpath in path:
                 subpath.scale(center,ratio)
@@ -3099,6 +4074,7 @@ class Path(SvgObj):
         >>> print([(round(item.x,2),round(item.y,2)) for item in p.paths[-1][-1].get_nodes()])
         [(-1, -1), (-3, -1), (-5, -3), (-5, -5)]
         """
+        self.clear_cache()
         for path in self.paths:
             for subpath in path:
                 subpath.reflect(o)
@@ -3121,6 +4097,7 @@ class Path(SvgObj):
         >>> print([(round(item.x,2),round(item.y,2)) for item in p.paths[-1][-1].get_nodes()])
         [(5, -1), (7, -1), (9, -3), (9, -5)]
         """
+        self.clear_cache()
         for path in self.paths:
             for subpath in path:
                 subpath.transform(matrix)
@@ -3130,6 +4107,7 @@ class Path(SvgObj):
         """
         import the path from svgPath
         svgpath string corresponds to 'd' field on inkscape
+        raise ValueError if a command has no or a truncated group of coordinates
         return the path
 
         Example:
@@ -3137,169 +4115,59 @@ class Path(SvgObj):
         >>> p = Path().from_svg_path('M 10,0 L 20,30 L 40,15 z')
         >>> print([(round(item.x,2),round(item.y,2)) for item in p.paths[-1][-1].get_nodes()])
         [(10.0, 0.0), (20.0, 30.0), (40.0, 15.0), (10.0, 0.0)]
+        >>> p = Path().from_svg_path('M 0 0 L 1 1 L 2')
+        Traceback (most recent call last):
+        ...
+        ValueError: truncated coordinates for L in M 0 0 L 1 1 L 2
+        >>> p = Path().from_svg_path('M')
+        Traceback (most recent call last):
+        ...
+        ValueError: missing coordinates for M in M
         """
-        svgList = svgPath.replace(',',' ').split()
         self.clear_path()
-        cObj = None
         previousNode = Point(0,0)
-        i = 0
-        while i < len(svgList):
-            if svgList[i] == 'M':
-                self.new_sub_path()
-                previousNode = Point(float(svgList[i+1]),float(svgList[i+2]))
-                i += 3
-                while i < len(svgList) and _is_num(svgList[i]):
-                    if not cObj:
-                        cObj = Polyline()
-                        cObj.add_node(previousNode)
-                    previousNode = Point(float(svgList[i]),float(svgList[i+1]))
-                    cObj.add_node(previousNode)
-                    i += 2
-                if cObj:
-                    self.add(cObj)
-                    cObj = None
-            elif svgList[i] == 'm':
+        for command,args in _svg_path_tokens(svgPath):
+            n = _svg_command_args.get(command.upper())
+            if n and not args:
+                raise ValueError('missing coordinates for %s in %s' % (command,svgPath))
+            if n and len(args) % n:
+                raise ValueError('truncated coordinates for %s in %s' % (command,svgPath))
+            if command == 'M' or command == 'm':
                 self.new_sub_path()
-                previousNode = Point(previousNode.x+float(svgList[i+1]),previousNode.y+float(svgList[i+2]))
-                i += 3
-                while i < len(svgList) and _is_num(svgList[i]):
-                    if not cObj:
-                        cObj = Polyline()
-                        cObj.add_node(previousNode)
-                    previousNode = Point(previousNode.x+float(svgList[i]),previousNode.y+float(svgList[i+1]))
-                    cObj.add_node(previousNode)
-                    i += 2
-                if cObj:
-                    self.add(cObj)
-                    cObj = None
-            elif svgList[i] == 'L':
-                cObj = Polyline()
-                cObj.add_node(previousNode)
-                i += 1
-                while i < len(svgList) and _is_num(svgList[i]):
-                    previousNode = Point(float(svgList[i]),float(svgList[i+1]))
-                    cObj.add_node(previousNode)
-                    i += 2
-                self.add(cObj)
-                cObj = None
-            elif svgList[i] == 'l':
-                cObj = Polyline()
-                cObj.add_node(previousNode)
-                i += 1
-                while i < len(svgList) and _is_num(svgList[i]):
-                    previousNode = Point(previousNode.x+float(svgList[i]),previousNode.y+float(svgList[i+1]))
-                    cObj.add_node(previousNode)
-                    i += 2
-                self.add(cObj)
-                cObj = None
-            elif svgList[i] == 'z' or svgList[i] == 'Z':
+                if command == 'M':
+                    coords = args
+                else:
+                    coords = _svg_absolute(previousNode.x,previousNode.y,args,2)[2:]
+                if len(coords) > 3:
+                    self.add(Polyline().from_flat(coords),copy=False)
+                previousNode = Point(coords[-2],coords[-1])
+            elif command in 'LlCcQq':
+                if command == 'L' or command == 'C' or command == 'Q':
+                    coords = [previousNode.x,previousNode.y]+args
+                elif command == 'l':
+                    coords = _svg_absolute(previousNode.x,previousNode.y,args,2)
+                elif command == 'c':
+                    coords = _svg_absolute(previousNode.x,previousNode.y,args,6)
+                else:
+                    coords = _svg_absolute(previousNode.x,previousNode.y,args,4)
+                if command == 'L' or command == 'l':
+                    cObj = Polyline()
+                elif command == 'C' or command == 'c':
+                    cObj = BCurve()
+                else:
+                    cObj = BCurve(order = 2)
+                self.add(cObj.from_flat(coords),copy=False)
+                previousNode = cObj.end().copy()
+            elif command == 'z' or command == 'Z':
                 self.close(curveType = 'polyline')
                 previousNode = self.paths[-1][-1].end()
-                i += 1
-            elif svgList[i] == 'C':
-                cObj = BCurve()
-                cObj.add_node(previousNode)
-                i += 1
-                while i < len(svgList) and _is_num(svgList[i]):
-                    previousNode = Point(float(svgList[i]),float(svgList[i+1]))
-                    cObj.add_node(previousNode)
-                    i += 2
-                self.add(cObj)
-                cObj = None
-            elif svgList[i] == 'c':
-                cObj = BCurve()
-                cObj.add_node(previousNode)
-                i += 1
-                while i < len(svgList) and _is_num(svgList[i]):
-                    cObj.add_node(Point(previousNode.x+float(svgList[i]),previousNode.y+float(svgList[i+1])))
-                    cObj.add_node(Point(previousNode.x+float(svgList[i+2]),previousNode.y+float(svgList[i+3])))
-                    previousNode = Point(previousNode.x+float(svgList[i+4]),previousNode.y+float(svgList[i+5]))
-                    cObj.add_node(previousNode)
-                    i += 6
-                self.add(cObj)
-                cObj = None
-            elif svgList[i] == 'Q':
-                cObj = BCurve(order=2)
-                cObj.add_node(previousNode)
-                i += 1
-                while i < len(svgList) and _is_num(svgList[i]):
-                    previousNode = Point(float(svgList[i]),float(svgList[i+1]))
-                    cObj.add_node(previousNode)
-                    i += 2
-                self.add(cObj)
-                cObj = None
-            elif svgList[i] == 'q':
-                cObj = BCurve(order=2)
-                cObj.add_node(previousNode)
-                i += 1
-                while i < len(svgList) and _is_num(svgList[i]):
-                    cObj.add_node(Point(previousNode.x+float(svgList[i]),previousNode.y+float(svgList[i+1])))
-                    previousNode = Point(previousNode.x+float(svgList[i+2]),previousNode.y+float(svgList[i+3]))
-                    cObj.add_node(previousNode)
-                    i += 4
-                self.add(cObj)
-                cObj = None
-            elif svgList[i] == 'A':
-                i += 1
-                while i < len(svgList) and _is_num(svgList[i]):
-                    rx = float(svgList[i])
-                    ry = float(svgList[i+1])
-                    phi = math.radians(float(svgList[i+2]))
-                    fa = int(svgList[i+3])
-                    fs = int(svgList[i+4])
-                    b = Point(float(svgList[i+5]),float(svgList[i+6])).rotate(Point(0,0),-phi)
-                    a = previousNode.copy().rotate(Point(0,0),-phi)
-
-                    rad = min(math.sqrt(((b.x-a.x)/rx)**2+((b.y-a.y)/ry)**2)/2.0,1)
-                    vx = (b.x-a.x)/rx/(2-4*fs)/rad
-                    vy = (b.y-a.y)/ry/(4*fs-2)
-                    if vy > 0:
-                        v = math.asin(vx)
-                    else:
-                        v = math.pi - math.asin(vx)
-                    if fa == 1:
-                        u = math.pi - (2*fs-1)*math.asin(rad)
-                    else:
-                        u = (2*fs-1)*math.asin(rad)
-                    center = Point(a.x-rx*math.cos(v-u),a.y-ry*math.sin(v-u)).rotate(Point(0,0),phi)
-                    cObj = Arc(center,rx,ry,phi,v-u,v+u)
-                    
-                    self.add(cObj)
-                    previousNode = Point(float(svgList[i+5]),float(svgList[i+6]))
-                    i += 7
-                cObj = None
-            elif svgList[i] == 'a':
-                i += 1
-                while i < len(svgList) and _is_num(svgList[i]):
-                    rx = float(svgList[i])
-                    ry = float(svgList[i+1])
-                    phi = math.radians(float(svgList[i+2]))
-                    fa = int(svgList[i+3])
-                    fs = int(svgList[i+4])
-                    b = Point(float(svgList[i+5])+previousNode.x,float(svgList[i+6])+previousNode.y).rotate(Point(0,0),-phi)
-                    a = previousNode.copy().rotate(Point(0,0),-phi)
-
-                    rad = min(math.sqrt(((b.x-a.x)/rx)**2+((b.y-a.y)/ry)**2)/2.0,1)
-                    vx = (b.x-a.x)/rx/(2-4*fs)/rad
-                    vy = (b.y-a.y)/ry/(4*fs-2)
-                    if vy > 0:
-                        v = math.asin(vx)
-                    else:
-                        v = math.pi - math.asin(vx)
-                    if fa == 1:
-                        u = math.pi - (2*fs-1)*math.asin(rad)
-                    else:
-                        u = (2*fs-1)*math.asin(rad)
-                    center = Point(a.x-rx*math.cos(v-u),a.y-ry*math.sin(v-u)).rotate(Point(0,0),phi)
-                    cObj = Arc(center,rx,ry,phi,v-u,v+u)
-                    
-                    self.add(cObj)
-                    previousNode = Point(float(svgList[i+5])+previousNode.x,float(svgList[i+6])+previousNode.y)
-                    i += 7
-                cObj = None
+            elif command == 'A' or command == 'a':
+                for i in range(0,len(args)-6,7):
+                    arc,previousNode = _svg_arc(previousNode,args[i:i+7],command == 'a')
+                    self.add(arc,copy=False)
             else:
 ### COMMENT : A TESTER
-                raise ValueError('unknown command %s in %s' % (svgList[i],svgPath))                
+                raise ValueError('unknown command %s in %s' % (command,svgPath))
 
         if matrix:
             self.transform(matrix)
@@ -3327,44 +4195,52 @@ class Path(SvgObj):
         else:
             tpath =self
 
-        path = ''
+        ## the words are joined once, each one is followed by a space
+        words = []
         for p in range(len(tpath.paths)):
             startPath = True
             for obj in tpath.paths[p]:
                 if startPath:
-                    path += 'M '+_str_num(obj.start().x,digit)+','+_str_num(obj.start().y,digit)+' '
+                    words.append('M')
+                    words.extend(_str_points([obj.start()],digit))
                     startPath =False
                 if type(obj) == Polyline:
-                    path += 'L '
-                    for i in range(1,len(obj.nodes)):
-                        path += _str_num(obj.nodes[i].x,digit)+','+_str_num(obj.nodes[i].y,digit)+' '
+                    words.append('L')
+                    words.extend(_str_points(obj.nodes[1:],digit))
                 elif type(obj) == BCurve:
                     if obj.order != 3:
                         cubicobj = obj.copy().to_cubic()
                     else:
                         cubicobj = obj
-                    path += 'C '
-                    for i in range(1,len(cubicobj.nodes)):
-                        path += _str_num(cubicobj.nodes[i].x,digit)+','+_str_num(cubicobj.nodes[i].y,digit)+' '
+                    words.append('C')
+                    words.extend(_str_points(cubicobj.nodes[1:],digit))
                 elif type(obj) == Arc:
-                    path += 'A '+_str_num(obj.rx,digit)+','+_str_num(obj.ry,digit)+' '+_str_num(degrees(obj.ax),digit)+' '
+                    words.append('A')
+                    words.extend(_str_points([(obj.rx,obj.ry)],digit))
+                    words.append(_str_num(math.degrees(obj.ax),digit))
                     if abs(obj.a2-obj.a1) > math.pi:
-                        path += '1 '
+                        words.append('1')
                     else:
-                        path += '0 '
+                        words.append('0')
                     if obj.a2-obj.a1 > 0:
-                        path += '1 '
+                        words.append('1')
                     else:
-                        path += '0 '
-                    path += _str_num(obj.end().x,digit)+','+_str_num(obj.end().y,digit)+' '
+                        words.append('0')
+                    words.extend(_str_points([obj.end()],digit))
             if tpath.is_closed(p):
-                path += 'z '
-        return path
+                words.append('z')
+        if not words:
+            return ''
+        return ' '.join(words)+' '
 
-    def to_scad_poly(self,approx = 5e-2 ,digit = 3):
+    def to_scad_poly(self,approx = 5e-2 ,digit = 3,flatten = 'sample',simplify = 'dp',count = None,cache = True):
         """
         return an approximate polygon string description from the path
         compatible with openscad
+        the subpaths are closed by lines but the path is not changed
+        flatten is the bezier curves method (see BCurve.to_polyline)
+        simplify and count are the simplification parameters (see Path.to_polyline)
+        cache False does not keep the flattening (see Path.iter_points)
 
         Example:
 
@@ -3374,26 +4250,604 @@ class Path(SvgObj):
         >>> p.add(d)
         >>> scadpoly = p.to_scad_poly(approx=0.1,digit=2)
         >>> print(scadpoly)
-        polygon(points=[[3,1],[4.37,1.3],[5.75,2.25],[6.7,3.63],[7,5]],paths=[[0,1,2,3,4]]);
+        polygon(points=[[3,1],[4.47,1.34],[5.75,2.25],[6.66,3.53],[7,5]],paths=[[0,1,2,3,4]]);
+        >>> print(p.is_closed())
+        False
         """
+        f = StringIO()
+        self.write_scad_poly(f,approx,digit,flatten,simplify,count,cache)
+        return f.getvalue()
+
+    def write_scad_poly(self,fileobj,approx = 5e-2 ,digit = 3,flatten = 'sample',simplify = 'dp',count = None,cache = False):
+        """
+        write the openscad polygon of the path (see to_scad_poly) in fileobj
+        the points are read from the flattening cache if the same flattening is kept
+        (see Path.iter_points), else they are streamed from the curves
+        and written by chunks of Path.scadChunk points
+        only the number of points of each subpath is kept for the paths indexes
+        so the memory used is bounded by the flattening of the largest curve
+        (chained segments of the same kind make one curve), not of the whole path
+        except with a vw count wich needs the whole subpath flattening (see Path.to_polyline)
+        cache True keeps the new flattening in the path cache instead,
+        wich costs the memory of the whole flattening
+        fileobj is an opened file or any object with a write method
+        return the path
+
+        Example:
+
+        >>> p = Path().from_svg_path('M 0,0 L 4,0 L 4,3 M 5,5 L 6,5 L 6,6 z')
+        >>> f = StringIO()
+        >>> p = p.write_scad_poly(f,digit=2)
+        >>> print(f.getvalue())
+        polygon(points=[[0,0],[4,0],[4,3],[5,5],[6,5],[6,6]],paths=[[0,1,2],[3,4,5]]);
+        >>> print(len(p._flatCache))
+        0
+        >>> p = p.write_scad_poly(StringIO(),digit=2,cache=True)
+        >>> print(len(p._flatCache))
+        1
+        >>> print([list(points) for points in p.iter_points()][0])
+        [(0.0, 0.0), (4.0, 0.0), (4.0, 3.0)]
+        """
+        fileobj.write('polygon(points=[')
+        sizes = []
+        sep = '['
+        for subPath in self.iter_points(approx,flatten,simplify,count,close = True,cache = cache):
+            n = 0
+            chunk = []
+            for p in subPath:
+                chunk.append(p)
+                if len(chunk) > Path.scadChunk:
+                    fileobj.write(sep+'],['.join(_str_points(chunk[:-1],digit))+']')
+                    sep = ',['
+                    n += len(chunk)-1
+                    chunk = chunk[-1:]
+            ## the last point (same as the first one) is not written
+            if len(chunk) > 1:
+                fileobj.write(sep+'],['.join(_str_points(chunk[:-1],digit))+']')
+                sep = ',['
+                n += len(chunk)-1
+            sizes.append(n)
+        fileobj.write('],paths=[')
         i = 0
-        for i in range(self.subpath_len()):
-            self.close(i,'polyline')
-        curve = self.to_polyline(approx)
-        points = ''
-        paths = ''
-        i = 0
-        for subPath in curve.paths:
-            paths += '['
-            for p in subPath[0].nodes[:-1]:
-                points += '['+_str_num(p.x,digit)+','+_str_num(p.y,digit)+'],'
-                paths += str(i)+','
-                i += 1
-            paths = paths[:-1]+'],'
+        sep = '['
+        for n in sizes:
+            fileobj.write(sep+','.join([str(j) for j in range(i,i+n)])+']')
+            sep = ',['
+            i += n
+        fileobj.write(']);')
+        return self
+
+class LazyPath(Path):
+    """
+    Path which keeps its svg description and the pending transformation matrix
+    the description is parsed only when the geometry is first needed
+
+    Example:
+
+    >>> p = LazyPath('M 10,0 L 20,30 L 40,15 z',TransformMatrix().translation(Vector(1,2)))
+    >>> print(p.is_parsed())
+    False
+    >>> print(p.bounding_box().get('width'))
+    30.0
+    >>> print(p.is_parsed())
+    True
+    """
+
+    def __init__(self,svgPath = '',matrix = None,param = {'style':{'fill':'none','stroke':'#000000','stroke-width':'0.3mm'}}):
+        """
+        Init the path
+        svgPath string corresponds to 'd' field on inkscape
+        matrix TransformMatrix applied to the path when it is parsed
+        """
+        Path.__init__(self,param)
+        self.from_svg_path(svgPath,matrix)
+
+    def _get_paths(self):
+        """
+        return the subpaths list
+        parse the svg description if it is not done yet
+        the description is kept until it is parsed without error
+        so an invalid description raises ValueError on each access
+
+        Example:
+
+        >>> p = LazyPath('M 0 0 L 1')
+        >>> for i in range(2):
+        ...     try:
+        ...         p.bounding_box()
+        ...     except ValueError as e:
+        ...         print(e)
+        truncated coordinates for L in M 0 0 L 1
+        truncated coordinates for L in M 0 0 L 1
+        """
+        if self.pending:
+            svgPath,matrix = self.pending
+            self.paths = Path().from_svg_path(svgPath,matrix).paths
+        return self._paths
+
+    def _set_paths(self,paths):
+        """
+        set the subpaths list and forget the pending svg description
+        """
+        self.clear_cache()
+        self.pending = None
+        self._paths = paths
+
+    paths = property(_get_paths,_set_paths)
+
+    def is_parsed(self):
+        """
+        return True if the svg description is already parsed
+
+        Example:
+
+        >>> p = LazyPath('M 10,0 L 20,30')
+        >>> print(p.is_parsed())
+        False
+        >>> print(p.subpath_len())
+        1
+        >>> print(p.is_parsed())
+        True
+        """
+        return self.pending == None
+
+    def copy(self):
+        """
+        return a copy of the path
+        an unparsed path gives an unparsed copy
+        """
+        if self.pending:
+            return LazyPath(self.pending[0],self.pending[1])
+        return Path.copy(self)
+
+    def from_svg_path(self,svgPath,matrix = None):
+        """
+        set the svg description of the path without parsing it
+        svgpath string corresponds to 'd' field on inkscape
+        return the path
+
+        Example:
+
+        >>> p = LazyPath().from_svg_path('M 10,0 L 20,30 L 40,15 z')
+        >>> print([(round(item.x,2),round(item.y,2)) for item in p.paths[-1][-1].get_nodes()])
+        [(10.0, 0.0), (20.0, 30.0), (40.0, 15.0), (10.0, 0.0)]
+        """
+        self.paths = []
+        if svgPath:
+            self.pending = (svgPath,matrix)
+        return self
+
+    def transform(self,matrix):
+        """
+        transform all curves
+        if the path is not parsed yet, only the pending matrix is updated
+        matrix TransformMatrix
+        return the object
+
+        Example:
+
+        >>> p = LazyPath('M 3,1 L 5,1')
+        >>> p.transform(TransformMatrix([1,0,0,-1,2,0])).is_parsed()
+        False
+        >>> print([(round(item.x,2),round(item.y,2)) for item in p.paths[-1][-1].get_nodes()])
+        [(5.0, -1.0), (7.0, -1.0)]
+        """
+        if self.pending:
+            svgPath,m = self.pending
+            if m:
+                matrix = matrix.mul(m)
+            self.clear_cache()
+            self.pending = (svgPath,matrix)
+            return self
+        return Path.transform(self,matrix)
+
+class PathStore(object):
+    """
+    columnar store of the curves of many paths
+    all coordinates are kept in one contiguous array of floats
+    instead of one Point object per node
+
+    kinds : one code per curve (0 polyline, -1 arc, n > 0 bezier curve of order n)
+    curveStart : offset in coords of each curve (one more item than curves)
+    subpathStart : index of the first curve of each subpath (one more item than subpaths)
+    pathStart : index of the first subpath of each path (one more item than paths)
+    coords : x,y of the nodes (center.x,center.y,rx,ry,ax,a1,a2 for an arc)
 
-        return 'polygon(points=['+points[:-1]+'],paths=['+paths[:-1]+']);'
+    Example:
 
-class Svg(object):
+    >>> s = PathStore()
+    >>> i = s.add_svg_path('M 10,0 L 20,30 L 40,15 z')
+    >>> j = s.add_svg_path('M 0,0 C 1,0 2,1 3,1')
+    >>> print(s.path_len(),len(s.coords))
+    2 16
+    >>> p = s.get_path(1)
+    >>> print([(item.x,item.y) for item in p.paths[-1][-1].get_nodes()])
+    [(0.0, 0.0), (1.0, 0.0), (2.0, 1.0), (3.0, 1.0)]
+    """
+
+    def __init__(self):
+        """
+        Init an empty store
+        """
+        self.clear()
+
+    def clear(self):
+        """
+        remove all paths from the store
+        return the object
+        """
+        self.kinds = array('b')
+        self.curveStart = array('l',[0])
+        self.subpathStart = array('l',[0])
+        self.pathStart = array('l',[0])
+        self.coords = array('d')
+        return self
+
+    def path_len(self):
+        """
+        return the number of paths in the store
+        """
+        return len(self.pathStart)-1
+
+    def add(self,path):
+        """
+        add a copy of the path curves at the end of the store
+        path is a Path
+        return the index of the path in the store
+        """
+        for subPath in path.paths:
+            for curve in subPath:
+                if type(curve) == Arc:
+                    self.kinds.append(-1)
+                    self.coords.extend((curve.center.x,curve.center.y,curve.rx,curve.ry,curve.ax,curve.a1,curve.a2))
+                else:
+                    if type(curve) == BCurve:
+                        self.kinds.append(curve.order)
+                    else:
+                        self.kinds.append(0)
+                    self.coords.extend(curve.to_flat())
+                self.curveStart.append(len(self.coords))
+            self.subpathStart.append(len(self.kinds))
+        self.pathStart.append(len(self.subpathStart)-1)
+        return self.path_len()-1
+
+    def add_svg_path(self,svgPath,matrix = None):
+        """
+        parse svgPath and add its curves at the end of the store
+        the coordinates of the svg commands are copied in the store
+        without Point or curve objects (but an Arc for each arc command)
+        the curves are the same as the ones of Path.from_svg_path
+        svgpath string corresponds to 'd' field on inkscape
+        matrix TransformMatrix applied to the path
+        raise ValueError if svgPath is invalid (see Path.from_svg_path)
+        return the index of the path in the store
+
+        Example:
+
+        >>> s = PathStore()
+        >>> i = s.add_svg_path('M 0,0 L 4,0 4,3 z M 5,5 q 1,0 1,1 t 1,1')
+        Traceback (most recent call last):
+        ...
+        ValueError: unknown command t in M 0,0 L 4,0 4,3 z M 5,5 q 1,0 1,1 t 1,1
+        >>> i = s.add_svg_path('M 0,0 L 4,0 4,3 z M 5,5 q 1,0 1,1 1,1 1,2')
+        >>> print(list(s.kinds),list(s.coords))
+        [0, 2] [0.0, 0.0, 4.0, 0.0, 4.0, 3.0, 0.0, 0.0, 5.0, 5.0, 6.0, 5.0, 6.0, 6.0, 7.0, 7.0, 7.0, 8.0]
+        """
+        kinds = self.kinds
+        coords = self.coords
+        first = len(kinds)
+        start = None ## index of the first curve of the current subpath
+        x,y = 0,0
+        try:
+            for command,args in _svg_path_tokens(svgPath):
+                n = _svg_command_args.get(command.upper())
+                if n and not args:
+                    raise ValueError('missing coordinates for %s in %s' % (command,svgPath))
+                if n and len(args) % n:
+                    raise ValueError('truncated coordinates for %s in %s' % (command,svgPath))
+                if command == 'M' or command == 'm':
+                    if start != None:
+                        self.subpathStart.append(len(kinds))
+                    start = len(kinds)
+                    if command == 'M':
+                        run = args
+                    else:
+                        run = _svg_absolute(x,y,args,2)[2:]
+                    if len(run) > 3:
+                        self._add_run(0,run,start)
+                    x,y = run[-2],run[-1]
+                elif start == None:
+                    raise ValueError('missing moveto before %s in %s' % (command,svgPath))
+                elif command in 'LCQ':
+                    run = [x,y]+args
+                    x,y = run[-2],run[-1]
+                    self._add_run(_svg_command_kinds[command],run,start)
+                elif command in 'lcq':
+                    run = _svg_absolute(x,y,args,n)
+                    x,y = run[-2],run[-1]
+                    self._add_run(_svg_command_kinds[command.upper()],run,start)
+                elif command == 'z' or command == 'Z':
+                    if len(kinds) > start:
+                        sx,sy = self._curve_ends(start)[0]
+                        ex,ey = self._curve_ends(len(kinds)-1)[1]
+                        if math.sqrt((ex-sx)**2+(ey-sy)**2) >= Coord.nullDistance:
+                            self._add_run(0,[ex,ey,sx,sy],start)
+                        x,y = self._curve_ends(len(kinds)-1)[1]
+                elif command == 'A' or command == 'a':
+                    for i in range(0,len(args)-6,7):
+                        arc,end = _svg_arc(Point(x,y),args[i:i+7],command == 'a')
+                        x,y = end.x,end.y
+                        if len(kinds) > start and kinds[-1] == -1:
+                            last = self.get_curve(len(kinds)-1)
+                            if last.append(arc):
+                                arc = last
+                                del kinds[-1]
+                                del coords[-7:]
+                                del self.curveStart[-1]
+                        kinds.append(-1)
+                        coords.extend((arc.center.x,arc.center.y,arc.rx,arc.ry,arc.ax,arc.a1,arc.a2))
+                        self.curveStart.append(len(coords))
+                else:
+                    raise ValueError('unknown command %s in %s' % (command,svgPath))
+        except ValueError:
+            ## the store is left as before the call
+            del kinds[first:]
+            del coords[self.curveStart[first]:]
+            del self.curveStart[first+1:]
+            del self.subpathStart[self.pathStart[-1]+1:]
+            raise
+        if start != None:
+            self.subpathStart.append(len(kinds))
+        self.pathStart.append(len(self.subpathStart)-1)
+        if matrix:
+            self.transform(matrix,self.path_len()-1)
+        return self.path_len()-1
+
+    def _add_run(self,kind,run,start):
+        """
+        add the curve of kind (0 polyline, n > 0 bezier curve of order n) from run,
+        its flat x0,y0,x1,y1... coordinates, at the end of the store
+        as with Path.add, it is merged in the last curve if this one has the same kind,
+        belongs to the subpath begun by the curve at index start and ends where run begins
+        """
+        kinds = self.kinds
+        coords = self.coords
+        if len(kinds) > start and kinds[-1] == kind and math.sqrt((coords[-2]-run[0])**2+(coords[-1]-run[1])**2) <= Coord.nullDistance:
+            coords.extend(run[2:])
+            self.curveStart[-1] = len(coords)
+        else:
+            kinds.append(kind)
+            coords.extend(run)
+            self.curveStart.append(len(coords))
+
+    def _curve_ends(self,index):
+        """
+        return the ((x,y),(x,y)) start and end points of the curve at index
+        """
+        if self.kinds[index] == -1:
+            arc = self.get_curve(index)
+            return (arc.start().x,arc.start().y),(arc.end().x,arc.end().y)
+        c = self.coords
+        start = self.curveStart[index]
+        end = self.curveStart[index+1]
+        return (c[start],c[start+1]),(c[end-2],c[end-1])
+
+    def get_curve(self,index):
+        """
+        return a new curve object (Polyline, BCurve or Arc) from the curve at index
+
+        Example:
+
+        >>> s = PathStore()
+        >>> i = s.add_svg_path('M 0,0 C 1,0 2,1 3,1')
+        >>> c = s.get_curve(0)
+        >>> print(c.get_order(),len(c.get_nodes()))
+        3 4
+        """
+        kind = self.kinds[index]
+        start = self.curveStart[index]
+        end = self.curveStart[index+1]
+        c = self.coords
+        if kind == -1:
+            return Arc(Point(c[start],c[start+1]),c[start+2],c[start+3],c[start+4],c[start+5],c[start+6])
+        if kind == 0:
+            return Polyline().from_flat(c[start:end])
+        return BCurve(kind).from_flat(c[start:end])
+
+    def get_path(self,index):
+        """
+        return a StorePath of the path at index
+        its curves are copied from the store when they are first needed (see StorePath)
+        """
+        return StorePath(self,index)
+
+    def transform(self,matrix,index = None):
+        """
+        transform in place the path at index or all paths if index is None
+        the StorePath whose curves are already built are not changed
+        matrix TransformMatrix
+        return the object
+
+        Example:
+
+        >>> s = PathStore()
+        >>> i = s.add_svg_path('M 3,1 L 5,1')
+        >>> print(list(s.transform(TransformMatrix([1,0,0,-1,2,0])).coords))
+        [5.0, -1.0, 7.0, -1.0]
+        """
+        if index == None:
+            first,last = 0,len(self.kinds)
+        else:
+            first = self.subpathStart[self.pathStart[index]]
+            last = self.subpathStart[self.pathStart[index+1]]
+        a,b,c,d,e,f = matrix.matrix
+        coords = self.coords
+        for i in range(first,last):
+            start = self.curveStart[i]
+            if self.kinds[i] == -1:
+                arc = self.get_curve(i).transform(matrix)
+                coords[start:start+7] = array('d',(arc.center.x,arc.center.y,arc.rx,arc.ry,arc.ax,arc.a1,arc.a2))
+            else:
+                for j in range(start,self.curveStart[i+1],2):
+                    x,y = coords[j],coords[j+1]
+                    coords[j] = a*x+c*y+e
+                    coords[j+1] = b*x+d*y+f
+        return self
+
+    def to_polyline(self,approx = 5e-2,flatten = 'sample',simplify = 'dp',count = None):
+        """
+        return a new store in which all paths are transformed to polylines
+        approx is maximum distance between the curve and the polyline
+        flatten, simplify and count are the Path.to_polyline parameters
+        the curves of one path at a time are built to be flattened
+        but the points are written in the new store without Polyline objects
+
+        Example:
+
+        >>> s = PathStore()
+        >>> i = s.add_svg_path('M 3,1 C 5,1 7,3 7,5 M 0,0 L 1,0')
+        >>> r = s.to_polyline(0.1)
+        >>> print(list(r.kinds),[round(c,2) for c in r.coords])
+        [0, 0] [3.0, 1.0, 4.47, 1.34, 5.75, 2.25, 6.66, 3.53, 7.0, 5.0, 0.0, 0.0, 1.0, 0.0]
+        """
+        store = PathStore()
+        for i in range(self.path_len()):
+            for points in self.get_path(i).iter_points(approx,flatten,simplify,count,cache = False):
+                for p in points:
+                    store.coords.extend(p)
+                store.kinds.append(0)
+                store.curveStart.append(len(store.coords))
+                store.subpathStart.append(len(store.kinds))
+            store.pathStart.append(len(store.subpathStart)-1)
+        return store
+
+class StorePath(Path):
+    """
+    Path whose curves are copied from a PathStore when they are first needed
+    it is a snapshot, not a view : once built, the curves are independent of the store
+    the changes of the store (as PathStore.transform) are not seen by the built path
+    and the changes of the path are not written in the store (PathStore.add adds a new copy)
+
+    Example:
+
+    >>> s = PathStore()
+    >>> i = s.add_svg_path('M 10,0 L 20,30 L 40,15 z')
+    >>> p = s.get_path(i)
+    >>> print(p.bounding_box().get('height'))
+    30.0
+    >>> s = s.transform(TransformMatrix([2,0,0,2,0,0]))
+    >>> print(p.bounding_box().get('height'),s.get_path(i).bounding_box().get('height'))
+    30.0 60.0
+    """
+
+    def __init__(self,store = None,index = None,param = {'style':{'fill':'none','stroke':'#000000','stroke-width':'0.3mm'}}):
+        """
+        Init the path
+        store PathStore
+        index integer, index of the path in the store
+        """
+        Path.__init__(self,param)
+        if store:
+            self.pending = (store,index)
+
+    def _get_paths(self):
+        """
+        return the subpaths list
+        build the curves from the store if it is not done yet
+        """
+        if self.pending:
+            store,index = self.pending
+            paths = []
+            for subPath in range(store.pathStart[index],store.pathStart[index+1]):
+                paths.append([store.get_curve(i) for i in range(store.subpathStart[subPath],store.subpathStart[subPath+1])])
+            self.paths = paths
+        return self._paths
+
+    def _set_paths(self,paths):
+        """
+        set the subpaths list and forget the store
+        """
+        self.clear_cache()
+        self.pending = None
+        self._paths = paths
+
+    paths = property(_get_paths,_set_paths)
+
+    def is_built(self):
+        """
+        return True if the curves are already built from the store
+        """
+        return self.pending == None
+
+    def copy(self):
+        """
+        return a copy of the path
+        an unbuilt path gives another unbuilt path of the store
+        """
+        if self.pending:
+            return StorePath(self.pending[0],self.pending[1])
+        return Path.copy(self)
+
+class SvgReader(object):
+    """
+    base class of the svg documents which can be exported
+    the subclasses set root, the svg root element, and transUnit with _set_unit
+    and give the walk generator of the (element,matrix,style) tuples of their paths
+    Svg keeps the whole tree and can modify it, SvgStream streams large files
+    """
+
+    def _set_unit(self,unit):
+        """
+        set the matrix from the paths unit to the svg root coordinates
+        """
+        height = _unit_to_pt(self.root.get('height'))
+        pathUnit = _unit_to_pt('1'+unit)
+        self.transUnit = TransformMatrix().set([pathUnit,0,0,-pathUnit,0,height])
+
+    def poly_write(self,filename,approx=0.2):
+        """
+        write the svg xml tree where each path is converted to a polyline 
+        """
+        s = Svg() 
+        unit = self.transUnit.invert()
+        for element,matrix,style in self.walk():
+            if element.get('d'):
+                p = LazyPath(element.get('d'),unit.mul(matrix))
+                s.add(p.to_polyline(approx=approx,cache=False)) ## p is not flattened again
+        s.write(filename)
+
+    def tsf_write(self,jobName,jobNumber,path='',dpi=500,simplify='dp',count=None):
+        """
+        write the svg xml tree in .tsf (Trotec laser cutter)
+        subpath order is reversed to cut holes before bounding path
+        simplify and count are the simplification parameters (see Path.to_polyline)
+        """
+        f = open(path+jobName+'.tsf','w')
+        f.write('<!-- Version: 9.4.2.1034>\n<!-- PrintingApplication: inkscape.exe>\n<BegGroup: Header>\n<ProcessMode: Standard>\n')
+        f.write('<Size: {0:.2f};{1:.2f}>\n'.format(_unit_to_mm(self.root.get('width')),_unit_to_mm(self.root.get('height'))))
+        f.write('<MaterialGroup: Standard>\n<MaterialName: Standard>\n<JobName: {0}>\n<JobNumber: {1}>\n<Resolution: {2}>\n<Cutline: none>\n<EndGroup: Header>\n'.format(jobName,jobNumber,dpi))
+        f.write('<BegGroup: DrawCommands>\n')
+
+        height = int(_unit_to_mm(self.root.get('height'))*dpi/25.4)
+        unit = self.transUnit.invert()
+
+        for element,matrix,style in self.walk():
+            if element.get('d'):
+                p = LazyPath(element.get('d'),unit.mul(matrix))
+                color = [255,0,0]
+                rvb = re.match('#([0-9A-Fa-f]{2})([0-9A-Fa-f]{2})([0-9A-Fa-f]{2})$',style.get('stroke',''))
+                if rvb:
+                    color = [int(x,base=16) for x in rvb.groups()]
+                subPaths = [list(points) for points in p.iter_points(25.4/dpi,simplify = simplify,count = count,cache = False)]
+                for points in reversed(subPaths):
+                    f.write('<DrawPolygon: {};{};{};{}'.format(len(points),color[0],color[1],color[2]))
+                    for x,y in points:
+                        f.write(';{};{}'.format(int(x*dpi/25.4),height-int(y*dpi/25.4)))
+                    f.write('>\n')
+        f.write('<EndGroup: DrawCommands>\n')
+        f.close()
+
+class Svg(SvgReader):
     """
     class SVG provides methods to open, read, modify and write SVG files
 
@@ -3421,7 +4875,7 @@ class Svg(object):
         svgFile is svg filename if None then default.svg will be the filename
         if mode is egg then svgFile will be searched in the gdesign module
         if mode is inkscape then svgFile will be searched in the inkscape program templates (usable in inkscape's plugin)
-        else use svgFile to search the file
+        else use svgFile to search the file, svgFile can also be an opened file
         """
 
         p = etree.XMLParser(huge_tree=True)
@@ -3431,14 +4885,75 @@ class Svg(object):
             content = __loader__.get_data(os.path.dirname(__file__)+os.path.sep+svgFile)
         elif mode =='inkscape':
             content = open('../templates/'+svgFile,mode='rb').read()
+        elif hasattr(svgFile,'read'):
+            content = svgFile.read()
         else:
             content = open(svgFile,mode='rb').read()
 
         self.root = etree.fromstring(content,p)
-        
-        height = _unit_to_pt(self.root.get('height'))
-        pathUnit = _unit_to_pt('1'+unit)
-        self.transUnit = TransformMatrix().set([pathUnit,0,0,-pathUnit,0,height])
+        self._ids = {} ## (type,id) : elements list in document order, see search
+        self._index(self.root)
+        self._set_unit(unit)
+
+    def _index(self,node):
+        """
+        add node and its svg descendants which have an id to the id index
+        """
+        for element in node.iter('{%s}*' % _nss['svg']):
+            objId = element.get('id')
+            if objId:
+                self._ids.setdefault((etree.QName(element).localname,objId),[]).append(element)
+
+    def _unindex(self,node):
+        """
+        remove node and its svg descendants from the id index
+        """
+        for element in node.iter('{%s}*' % _nss['svg']):
+            key = (etree.QName(element).localname,element.get('id'))
+            if key in self._ids:
+                elements = [e for e in self._ids[key] if e is not element]
+                if elements:
+                    self._ids[key] = elements
+                else:
+                    del self._ids[key]
+
+    def walk(self,node = None):
+        """
+        generator of the paths of the svg xml tree in document order
+        the groups are walked through depth first from node (root by default)
+        and their transforms and styles are carried down to their paths
+        yield (element,matrix,style) tuples where
+         element is the path xml element
+         matrix is the TransformMatrix of the groups and path transforms
+         style is the dictionary of the path style updated over the groups styles
+        the style dictionaries are shared and must not be modified
+        """
+        if node is None:
+            node = self.root
+        gTag = _subst_ns('svg:g')
+        pathTag = _subst_ns('svg:path')
+        stack = [(iter(node),TransformMatrix(),{})]
+        while stack:
+            children,matrix,style = stack[-1]
+            for child in children:
+                if child.tag != gTag and child.tag != pathTag:
+                    continue
+                childMatrix = matrix
+                transText = child.get('transform')
+                if transText:
+                    childMatrix = matrix.mul(TransformMatrix().from_text(transText))
+                childStyle = style
+                styleText = child.get('style')
+                if styleText:
+                    childStyle = dict(style)
+                    childStyle.update(_style_dict(styleText))
+                if child.tag == pathTag:
+                    yield (child,childMatrix,childStyle)
+                else:
+                    stack.append((iter(child),childMatrix,childStyle))
+                    break
+            else:
+                stack.pop()
 
     def exist(self,request):
         """
@@ -3456,9 +4971,10 @@ class Svg(object):
         delete an object in the svg xml tree
         objType and objId are type and id of the xml element
         """
-        result = self.root.xpath('//svg:%s[@id="%s"]'%(objType,objId),namespaces=_nss)
+        result = self._ids.get((objType,objId))
         if result:
-            for node in result:
+            for node in list(result):
+                self._unindex(node)
                 node.getparent().remove(node)
             return True
         return False
@@ -3469,8 +4985,10 @@ class Svg(object):
         objType must be path or g
         return a tuple (node,transform)
         where node is the xml element in the tree and transform is the transform matrix to reach the element
+        the elements are found with the id index built when the file is read
+        and updated by add and delete
         """
-        result = self.root.xpath('//svg:%s[@id="%s"]'%(objType,objId),namespaces=_nss)
+        result = self._ids.get((objType,objId))
         if result:
             node = result[0]
             tr = node.get('transform')
@@ -3492,10 +5010,12 @@ class Svg(object):
     def get_path(self,idPath):
         """
         return the path with idPath id
+        its 'd' description is parsed when the geometry is first needed (see LazyPath)
+        so an invalid one raises ValueError then, not in get_path
         """
         result = self.search(idPath)
         if result:
-            return Path().from_svg_path(result[0].get('d'),self.transUnit.invert().mul(result[1]))
+            return LazyPath(result[0].get('d'),self.transUnit.invert().mul(result[1]))
         else:
             return None ## raise ?
 
@@ -3504,8 +5024,20 @@ class Svg(object):
         add a group or a path in the svg xml tree
         where is the group id where the object will be located
         if the object has no id, a random one will be used
+        the object is a Group or a Path, or an object of their subclasses such as LazyPath
         
         return the object's id
+
+        Example:
+
+        >>> s = Svg(BytesIO(b'<svg xmlns="http://www.w3.org/2000/svg" width="10mm" height="10mm"><path id="a" d="M 0,0 L 1,1"/></svg>'),mode='file')
+        >>> i = s.add(s.get_path('a'))
+        >>> print(i.startswith('path'))
+        True
+        >>> print(s.get_path(i).to_svg_path(2) == s.get_path('a').to_svg_path(2))
+        True
+        >>> print(s.search(i)[0].get('d').strip())
+        M 0,0 L 1,1
         """
 
         if where:
@@ -3515,6 +5047,13 @@ class Svg(object):
         else:
             location = (self.root,TransformMatrix())
 
+        if isinstance(svgObj,Path):
+            objType = 'path'
+        elif isinstance(svgObj,Group):
+            objType = 'g'
+        else:
+            raise TypeError('Inappropriate %s type' % type(svgObj))
+
         idSvgObj = svgObj.get_param('id')
         if not idSvgObj:
             newObj = False
@@ -3522,42 +5061,23 @@ class Svg(object):
                 ido = ''
                 while len(ido) < 5:
                     ido = str(random.random())[2:7]
-                if type(svgObj) == Path:
-                    idSvgObj = 'path'+ ido
-                    newObj = self.root.xpath('//svg:path[@id="%s"]'%idSvgObj,namespaces=_nss) == []
-                elif type(svgObj) == Group:
-                    idSvgObj = 'g'+ ido
-                    newObj = self.root.xpath('//svg:g[@id="%s"]'%idSvgObj,namespaces=_nss) == []
-                else:
-                    raise TypeError('Inappropriate %s type' % type(svgObj))
+                idSvgObj = objType + ido
+                newObj = (objType,idSvgObj) not in self._ids
         else:
             idRoot = idSvgObj
-            if type(svgObj) == Path:
-                newObj = self.root.xpath('//svg:path[@id="%s"]'%idSvgObj,namespaces=_nss) == []
-            elif type(svgObj) == Group:
-                newObj = self.root.xpath('//svg:g[@id="%s"]'%idSvgObj,namespaces=_nss) == []
-            else:
-                raise TypeError('Inappropriate %s type' % type(svgObj))
+            newObj = (objType,idSvgObj) not in self._ids
             while not newObj:
                 idp = ''
                 while len(idp) < 3:
                     idp = str(random.random())[2:5]
-                idsvgObj = idRoot + idp
-                if type(svgObj) == Path:
-                    newObj = self.root.xpath('//svg:path[@id="%s"]'%idSvgObj,namespaces=_nss) == []
-                elif type(svgObj) == Group:
-                    newObj = self.root.xpath('//svg:g[@id="%s"]'%idSvgObj,namespaces=_nss) == []
-                else:
-                    raise TypeError('Inappropriate %s type' % type(svgObj))
+                idSvgObj = idRoot + idp
+                newObj = (objType,idSvgObj) not in self._ids
         svgObj.add_param('id',idSvgObj)
         
-        if type(svgObj) == Path:
+        if objType == 'path':
             svgObj.add_param('d',svgObj.to_svg_path(matrix = location[1].invert().mul(self.transUnit)))
-            etree.SubElement(location[0],_subst_ns('svg:path'),_subst_ns(svgObj.get_params()))
-        elif type(svgObj) == Group:
-            etree.SubElement(location[0],_subst_ns('svg:g'),_subst_ns(svgObj.get_params()))
-        else:
-            raise TypeError('Inappropriate %s type' % type(svgObj))
+        element = etree.SubElement(location[0],_subst_ns('svg:'+objType),_subst_ns(svgObj.get_params()))
+        self._index(element)
         
         return idSvgObj
 
@@ -3569,6 +5089,7 @@ class Svg(object):
         search = self.root.xpath(where,namespaces=_nss)
         if search:
             _to_xml(search[0],name,dic)
+            self._index(search[0][-1])
             return True
         else:
             return False
@@ -3581,39 +5102,77 @@ class Svg(object):
         f.write(etree.tostring(self.root))
         f.close()
 
-    def poly_write(self,filename,approx=0.2):
-        """
-        write the svg xml tree where each path is converted to a polyline 
-        """
-        s = Svg() 
-        paths = _get_path(self.root)
-        for path in paths:
-            p = self.get_path(path['id'])
-            s.add(p.to_polyline(approx=approx))
-        s.write(filename)
+class SvgStream(SvgReader):
+    """
+    read only svg document which is parsed while it is walked through
+    for the exporters of very large files (see SvgReader)
+    it has no search or tree editing methods, use Svg for them
+    only the root element is read at initialisation
+    walk reads the file with etree.iterparse and clears the elements once read
+    so the whole tree is never kept in memory and it can be walked only once
+
+    Example:
+
+    >>> s = SvgStream(BytesIO(b'<svg xmlns="http://www.w3.org/2000/svg" width="10mm" height="10mm"><g transform="translate(1,2)"><path id="a" d="M 0,0 L 1,1"/></g></svg>'),mode='file')
+    >>> for element,matrix,style in s.walk():
+    ...     print(element.get('id'))
+    ...     print(matrix.get())
+    a
+    [1, 0, 0, 1, 1.0, 2.0]
+    """
 
-    def tsf_write(self,jobName,jobNumber,path='',dpi=500):
+    def __init__(self,svgFile = None,mode = 'egg',unit = 'mm'):
         """
-        write the svg xml tree in .tsf (Trotec laser cutter)
-        subpath order is reversed to cut holes before bounding path
+        open a svg file for streaming
+        svgFile and mode are the same as in Svg, svgFile can also be an opened file in 'file' mode
         """
-        f = open(path+jobName+'.tsf','w')
-        f.write('<!-- Version: 9.4.2.1034>\n<!-- PrintingApplication: inkscape.exe>\n<BegGroup: Header>\n<ProcessMode: Standard>\n')
-        f.write('<Size: {0:.2f};{1:.2f}>\n'.format(_unit_to_mm(self.root.get('width')),_unit_to_mm(self.root.get('height'))))
-        f.write('<MaterialGroup: Standard>\n<MaterialName: Standard>\n<JobName: {0}>\n<JobNumber: {1}>\n<Resolution: {2}>\n<Cutline: none>\n<EndGroup: Header>\n'.format(jobName,jobNumber,dpi))
-        f.write('<BegGroup: DrawCommands>\n')
-
-        height = int(_unit_to_mm(self.root.get('height'))*dpi/25.4)
-        paths = _get_path(self.root,[])
-
-        for path in paths:
-            p = self.get_path(path['id'])
-            if p:
-                poly = p.to_polyline(25.4/dpi)
-                for i in reversed(range(len(poly.paths))):
-                    f.write('<DrawPolygon: {};{};{};{}'.format(len(poly.paths[i][0].nodes),path['color'][0],path['color'][1],path['color'][2]))
-                    for pt in poly.paths[i][0].nodes:
-                        f.write(';{};{}'.format(int(pt.x*dpi/25.4),height-int(pt.y*dpi/25.4)))
-                    f.write('>\n')
-        f.write('<EndGroup: DrawCommands>\n')
-        f.close()
+        if not svgFile:
+            svgFile = 'default.svg'
+        if mode == 'egg':
+            source = BytesIO(__loader__.get_data(os.path.dirname(__file__)+os.path.sep+svgFile))
+        elif mode =='inkscape':
+            source = '../templates/'+svgFile
+        else:
+            source = svgFile
+
+        self._events = etree.iterparse(source,events=('start','end'),huge_tree=True)
+        event,self.root = next(self._events)
+        self._set_unit(unit)
+
+    def walk(self,node = None):
+        """
+        generator of the paths of the svg file as the parser reaches them
+        yield the same (element,matrix,style) tuples as Svg.walk
+        the element is cleared after it has been yielded
+        """
+        if node is not None:
+            raise ValueError('a svg stream is walked from its root')
+        if self._events is None:
+            raise ValueError('the svg stream has already been read')
+        events = self._events
+        self._events = None
+        gTag = _subst_ns('svg:g')
+        pathTag = _subst_ns('svg:path')
+        stack = [(TransformMatrix(),{},True)] ## (matrix,style,walked) of the opened elements
+        for event,element in events:
+            if event == 'start':
+                matrix,style,walked = stack[-1]
+                if walked and (element.tag == gTag or element.tag == pathTag):
+                    transText = element.get('transform')
+                    if transText:
+                        matrix = matrix.mul(TransformMatrix().from_text(transText))
+                    styleText = element.get('style')
+                    if styleText:
+                        style = dict(style)
+                        style.update(_style_dict(styleText))
+                    stack.append((matrix,style,True))
+                else:
+                    stack.append((None,None,False))
+            else:
+                matrix,style,walked = stack.pop()
+                if walked and element.tag == pathTag:
+                    yield (element,matrix,style)
+                if element is not self.root: ## the root attributes are still read by the exporters
+                    element.clear()
+                    while element.getprevious() is not None:
+                        del element.getparent()[0]
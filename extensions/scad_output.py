@@ -4,10 +4,22 @@
 scad-output
 """
 
+import os.path
+import json
+import hashlib
 import inkex
 from gdesign import *
 
-def get_path(node,includes,pathList = [],transform=''):
+def get_path(node,includes,pathList = None,matrix = None):
+    """
+    return the list of the groups commands and paths under node
+    matrix is the TransformMatrix of node's groups, composed while descending
+    each group transform is parsed once and each path gets its own matrix
+    """
+    if pathList is None:
+        pathList = []
+    if matrix is None:
+        matrix = TransformMatrix()
     for subNode in node:
         if subNode.tag == inkex.addNS('g','svg'):
             groupid = subNode.get('id')
@@ -23,9 +35,9 @@ def get_path(node,includes,pathList = [],transform=''):
                     pathList.append(params)
                 trans = subNode.get('transform')
                 if trans:
-                    get_path(subNode,includes,pathList,transform+' '+trans)
+                    get_path(subNode,includes,pathList,matrix.mul(TransformMatrix().from_text(trans)))
                 else:
-                    get_path(subNode,includes,pathList,transform[:])
+                    get_path(subNode,includes,pathList,matrix)
                 if sfoot:
                     params = {'type':'group','#id':groupid}
                     params['scad-cmd'] = sfoot.replace('#id',params['#id'])
@@ -34,9 +46,9 @@ def get_path(node,includes,pathList = [],transform=''):
             params = {'type':'path','#id':subNode.get('id')}
             trans = subNode.get('transform')
             if trans:
-                params['transform'] = transform + ' ' + trans
+                params['matrix'] = matrix.mul(TransformMatrix().from_text(trans))
             else:
-                params['transform'] = transform
+                params['matrix'] = matrix
             params['pos'] = subNode.get('scad-pos')
             params['#fill'] = '[0,0,0]'
             style = subNode.get('style')
@@ -108,6 +120,14 @@ class ScadOutput(inkex.Effect):
                         action="store", type="string", 
                         dest="error_unit", default="mm",
                         help="error unit")
+        self.OptionParser.add_option("--flatten",
+                        action="store", type="string", 
+                        dest="flatten", default="sample",
+                        help="curves flattening method")
+        self.OptionParser.add_option("--cache_file",
+                        action="store", type="string", 
+                        dest="cache_file", default="",
+                        help="polygons cache filename")
         self.OptionParser.add_option("--includes",
                         action="store", type="string", 
                         dest="includes", default="",
@@ -131,16 +151,35 @@ class ScadOutput(inkex.Effect):
         if not includes.define(inctext):
             inkex.debug('wrong layer and groups includes')
 
+        ## polygons of the previous export, keyed by a hash of all their parameters
+        cacheName = self.options.cache_file
+        cache = {}
+        if cacheName:
+            cacheName = os.path.dirname(self.svg_file) + os.path.sep + cacheName
+            try:
+                f = open(cacheName)
+                cache = json.load(f)
+                f.close()
+            except (IOError,ValueError):
+                cache = {}
+        newCache = {}
+
         pathList = get_path(self.document.getroot(),includes)
         for path in pathList:
             if path['type'] == 'group':
                 print path['scad-cmd']
             elif path['type'] == 'path':
-                svgpath = Path().from_svg_path(path['d'],transUnit.mul(TransformMatrix().from_text(path['transform'])))
-                if path['pos']:
-                    bbox = svgpath.bounding_box()
-                    center = bbox.get(path['pos']).reflect(Point(0,0))
-                    svgpath.translate(center)
+                matrix = transUnit.mul(path['matrix'])
+                key = hashlib.sha1(repr((path['d'],matrix.get(),error,self.options.openscad_digit,path['pos'],self.options.flatten)).encode('utf-8')).hexdigest()
+                poly = cache.get(key)
+                if poly is None:
+                    svgpath = LazyPath(path['d'],matrix)
+                    if path['pos']:
+                        bbox = svgpath.bounding_box()
+                        center = bbox.get(path['pos']).reflect(Point(0,0))
+                        svgpath.translate(center)
+                    poly = svgpath.to_scad_poly(error,self.options.openscad_digit,self.options.flatten)
+                newCache[key] = poly
 
                 if self.options.header_path:
                     head = self.options.header_path.replace('#id',path['#id'])+'\n'
@@ -150,7 +189,13 @@ class ScadOutput(inkex.Effect):
                     foot = '\n' + self.options.footer_path.replace('#id',path['#id'])
                 else:
                     foot = ''
-                print  head + path['header'] + svgpath.to_scad_poly(error,self.options.openscad_digit) + path['footer'] + foot
+                print  head + path['header'] + poly + path['footer'] + foot
+
+        ## only the polygons of this export are kept
+        if cacheName and newCache != cache:
+            f = open(cacheName,mode='w')
+            json.dump(newCache,f)
+            f.close()
             
         if self.options.footer:
             print self.options.footer